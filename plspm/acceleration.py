@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+#
+# Copyright (C) 2019 Google Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np, scipy.linalg as linalg, plspm.util as util
+from enum import Enum
+from typing import Tuple
+
+
+# The calculators passed to the accelerators below iterate the PLS algorithm one step at a time (``iterate``, which
+# returns the squared change in the outer weights or scores), and expose the point they are at as a flat array
+# (``state``), which can be replaced with an extrapolated one (``restore``) for the next step to start from. The
+# calculation is always left at the result of a plain step once it has converged. As without acceleration, at most the
+# given number of iterations are run, and the accelerators return how many were, how many of them were extrapolated,
+# and whether the iterations converged.
+
+
+class _Squarem(util.Value):
+
+    def __init__(self, steps: int = 2):
+        super().__init__("SQUAREM")
+        self.__steps = steps
+
+    def solve(self, calculator, scheme, tolerance: float, iterations: int) -> Tuple[int, int, bool]:
+        iteration = 0
+        extrapolations = 0
+        # After an extrapolation is discarded, the next ones are skipped for a number of cycles that doubles with each
+        # consecutive failure, so that iterations that do not lend themselves to extrapolation run almost as plain ones.
+        backoff = 0
+        skip = 0
+        while True:
+            # Each block's weights only depend on those of the adjacent blocks, so for a path model whose graph has no
+            # odd cycles, the iterations have pairs of rates of convergence of opposite signs, which no single step
+            # length can cancel out. Extrapolating a map of two iterations at a time has a single rate for each pair.
+            points = [calculator.state()]
+            for _ in range(2):
+                for _ in range(self.__steps):
+                    iteration += 1
+                    convergence = calculator.iterate(scheme)
+                    if convergence < tolerance or iteration >= iterations:
+                        return iteration, extrapolations, convergence < tolerance
+                points.append(calculator.state())
+            start, first, second = points
+            # Squared extrapolation (Varadhan and Roland's SqS3) from the two steps, using the step length that
+            # minimises the residual of the linear approximation. A step length of -1 just gives the second point, and
+            # one between -1 and 0 damps iterations that oscillate.
+            change = first - start
+            curvature = second - first - change
+            with np.errstate(invalid="ignore", divide="ignore"):
+                step = -np.sqrt(np.power(change, 2).sum() / np.power(curvature, 2).sum())
+            if not np.isfinite(step) or skip > 0:
+                skip = max(skip - 1, 0)
+                continue
+            calculator.restore(start - 2 * step * change + step * step * curvature)
+            iteration += 1
+            extrapolated = calculator.iterate(scheme)
+            if extrapolated < tolerance:
+                return iteration, extrapolations + 1, True
+            if not extrapolated <= convergence:
+                # Safeguard: an extrapolation that does not reduce the change is discarded, and the iteration carries on
+                # from the second point.
+                calculator.restore(second)
+                backoff = max(2 * backoff, 1)
+                skip = backoff
+            else:
+                extrapolations += 1
+                backoff = 0
+            if iteration >= iterations:
+                return iteration, extrapolations, False
+
+
+class _Anderson(util.Value):
+
+    def __init__(self, depth: int = 5):
+        super().__init__("ANDERSON")
+        self.__depth = depth
+
+    def solve(self, calculator, scheme, tolerance: float, iterations: int) -> Tuple[int, int, bool]:
+        iteration = 0
+        extrapolations = 0
+        points = []
+        residuals = []
+        previous = np.inf
+        while True:
+            point = calculator.state()
+            iteration += 1
+            convergence = calculator.iterate(scheme)
+            if convergence < tolerance or iteration >= iterations:
+                return iteration, extrapolations, convergence < tolerance
+            image = calculator.state()
+            if not convergence <= previous:
+                # Safeguard: the history is discarded whenever the change grows, so that the iteration restarts from a
+                # plain step.
+                points, residuals = [], []
+            previous = convergence
+            points = (points + [point])[-self.__depth - 1:]
+            residuals = (residuals + [image - point])[-self.__depth - 1:]
+            if len(points) < 2:
+                continue
+            # Anderson mixing: the combination of the last steps whose residuals cancel out best, in the least squares
+            # sense, taken a full step further.
+            point_changes = np.diff(np.column_stack(points), axis=1)
+            residual_changes = np.diff(np.column_stack(residuals), axis=1)
+            gamma, _, _, _ = linalg.lstsq(residual_changes, residuals[-1])
+            extrapolated = image - np.dot(point_changes + residual_changes, gamma)
+            if np.isfinite(extrapolated).all():
+                calculator.restore(extrapolated)
+                extrapolations += 1
+
+
+class Acceleration(Enum):
+    """
+    Optionally, the extrapolation to use to accelerate the convergence of the outer weights. By default, the PLS
+    algorithm iterates until the weights stop changing, which can take many iterations for weakly identified models.
+
+    - ``SQUAREM`` extrapolates along the squared polynomial of Varadhan and Roland, from pairs of iterations.
+    - ``ANDERSON`` mixes the last five iterations (Anderson acceleration), and usually needs the fewest iterations.
+
+    Both check that each extrapolation reduces the change in the weights, and otherwise fall back to plain iterations.
+    Each extrapolated point is evaluated with an iteration of the algorithm, which counts towards the maximum number of
+    iterations. Models with several solutions, such as some nonmetric models with formative blocks, may converge to a
+    different one than without acceleration.
+    """
+    SQUAREM = _Squarem()
+    ANDERSON = _Anderson()
@@ -15,106 +15,1058 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import plspm.config as c, pandas as pd, numpy as np, plspm.inner_model as im, plspm.outer_model as om, time
-from multiprocessing import Process, Queue
+import plspm.config as c, pandas as pd, numpy as np, plspm.inner_model as im, plspm.outer_model as om, traceback, time
+import plspm.util as util
+import collections, contextlib, functools, hashlib, os, threading
+from concurrent.futures import Executor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import Process, Queue, current_process
+from multiprocessing.shared_memory import SharedMemory
 from queue import Empty
-from plspm.weights import WeightsCalculatorFactory
+from plspm.weights import WeightsCalculatorFactory, ConvergenceError
 from plspm.estimator import Estimator
+from plspm.streaming import StreamingSummary
+from plspm.pool import WorkerPool, _Shared
+from plspm.htmt import Htmt
+from typing import Union, Tuple
+from threadpoolctl import threadpool_limits
 
-def _create_summary(data: pd.DataFrame, original):
-    summary = pd.DataFrame(0, index=data.columns, columns=["original", "mean", "std.error", "perc.025", "perc.975", "t stat."])
-    summary.loc[:, "mean"] = data.mean(axis=0)
-    summary.loc[:, "std.error"] = data.std(axis=0)
-    summary.loc[:, "perc.025"] = data.quantile(0.025, axis=0)
-    summary.loc[:, "perc.975"] = data.quantile(0.975, axis=0)
+def _create_summary(data: pd.DataFrame, original, scale: float = 1):
+    return _summary(data.columns, original, data.mean(axis=0), data.std(axis=0), data.quantile(0.025, axis=0),
+                    data.quantile(0.975, axis=0), scale)
+
+
+def _summary(index: list, original, mean, std, lower, upper, scale: float = 1):
+    # With a scale other than 1 (for subsampling), each draw x is taken to stand for original + scale * (x - original),
+    # so that the dispersion of the draws is shrunk around the original estimate.
+    summary = pd.DataFrame(0, index=index, columns=["original", "mean", "std.error", "perc.025", "perc.975", "t stat."])
     summary.loc[:, "original"] = original
-    summary.loc[:, "t stat."] = original / data.std(axis=0)
+    original = summary.loc[:, "original"].values
+    if scale == 1:
+        summary.loc[:, "mean"] = np.asarray(mean)
+        summary.loc[:, "std.error"] = np.asarray(std)
+        summary.loc[:, "perc.025"] = np.asarray(lower)
+        summary.loc[:, "perc.975"] = np.asarray(upper)
+    else:
+        summary.loc[:, "mean"] = original + scale * (np.asarray(mean) - original)
+        summary.loc[:, "std.error"] = scale * np.asarray(std)
+        summary.loc[:, "perc.025"] = original + scale * (np.asarray(lower) - original)
+        summary.loc[:, "perc.975"] = original + scale * (np.asarray(upper) - original)
+    summary.loc[:, "t stat."] = summary.loc[:, "original"] / summary.loc[:, "std.error"]
     return summary
 
 
-class BootstrapProcess(Process):
-    def __init__(self, queue: Queue, config: c.Config, data: pd.DataFrame, inner_model: im.InnerModel, calculator: WeightsCalculatorFactory, iterations: int):
-        super(BootstrapProcess, self).__init__()
-        self.__queue = queue
+class _Draws:
+    """Internal class that keeps every bootstrap draw, so that the summaries can be calculated exactly."""
+    def __init__(self, labels: dict, scale: float = 1):
+        self.__labels = labels
+        self.__scale = scale
+        self.__chunks = []
+
+    def prepare(self, results: dict) -> dict:
+        return results
+
+    def add(self, results: dict):
+        self.__chunks.append({statistic: results[statistic] for statistic in self.__labels})
+
+    def summary(self, statistic: str, original) -> pd.DataFrame:
+        draws = np.concatenate([chunk[statistic] for chunk in self.__chunks], axis=0)
+        return _create_summary(pd.DataFrame(draws, columns=self.__labels[statistic]), original, self.__scale)
+
+    def state(self) -> dict:
+        return {statistic: np.concatenate([np.empty((0, len(labels)))] + [chunk[statistic] for chunk in self.__chunks],
+                                          axis=0) for statistic, labels in self.__labels.items()}
+
+    def restore(self, state: dict):
+        self.__chunks = [{statistic: state[statistic] for statistic in self.__labels}]
+
+
+class _StreamingDraws:
+    """Internal class that only keeps running summaries of the bootstrap draws (see :mod:`.streaming`), so that memory
+    use depends on the number of parameters but not on the number of resamples."""
+    def __init__(self, labels: dict, scale: float = 1):
+        self.__labels = labels
+        self.__scale = scale
+        self.__summaries = {statistic: StreamingSummary(len(labels[statistic])) for statistic in labels}
+
+    def prepare(self, results: dict) -> dict:
+        # Called by the workers, so that only the summaries of a chunk need to be sent back.
+        for statistic in self.__labels:
+            summary = StreamingSummary(len(self.__labels[statistic]))
+            summary.update(results[statistic])
+            results[statistic] = summary
+        return results
+
+    def add(self, results: dict):
+        for statistic in self.__labels:
+            self.__summaries[statistic].merge(results[statistic])
+
+    def summary(self, statistic: str, original) -> pd.DataFrame:
+        summary = self.__summaries[statistic]
+        return _summary(self.__labels[statistic], original, summary.mean(), summary.std(), summary.quantile(0.025),
+                        summary.quantile(0.975), self.__scale)
+
+    def state(self) -> dict:
+        state = {}
+        for statistic, summary in self.__summaries.items():
+            state.update(_prefixed(statistic, summary.state()))
+        return state
+
+    def restore(self, state: dict):
+        for statistic, summary in self.__summaries.items():
+            summary.restore(_unprefixed(statistic, state))
+
+
+class _Accounting:
+    """Internal class that keeps track of how many resamples failed and why, and of where the time went."""
+    def __init__(self):
+        self.__iterations = []
+        self.__seconds = []
+        self.__failures = collections.Counter()
+        self.__workers = collections.OrderedDict()
+
+    def add(self, results: dict):
+        self.__iterations.append(results["iterations"])
+        self.__seconds.append(results["seconds"])
+        self.__failures.update(results["failures"])
+        worker = self.__workers.setdefault(results["worker"], {"chunks": 0, "resamples": 0, "seconds": 0.0})
+        worker["chunks"] += 1
+        worker["resamples"] += results["resamples"]
+        worker["seconds"] += results["elapsed"]
+
+    def state(self) -> dict:
+        return {
+            "iterations": self.iterations(),
+            "seconds": self.seconds(),
+            "failures": np.array(list(self.__failures.keys()), dtype=str),
+            "failure_counts": np.array(list(self.__failures.values()), dtype=int),
+            "workers": np.array(list(self.__workers.keys()), dtype=str),
+            "worker_chunks": np.array([worker["chunks"] for worker in self.__workers.values()], dtype=int),
+            "worker_resamples": np.array([worker["resamples"] for worker in self.__workers.values()], dtype=int),
+            "worker_seconds": np.array([worker["seconds"] for worker in self.__workers.values()], dtype=float),
+        }
+
+    def restore(self, state: dict):
+        self.__iterations = [state["iterations"]]
+        self.__seconds = [state["seconds"]]
+        self.__failures = collections.Counter(dict(zip(state["failures"].tolist(), state["failure_counts"].tolist())))
+        # Workers of the interrupted bootstrap are kept apart from those of this one, even if they share a name.
+        self.__workers = collections.OrderedDict(
+            ("resumed " + name, {"chunks": chunks, "resamples": resamples, "seconds": seconds})
+            for name, chunks, resamples, seconds in zip(state["workers"].tolist(), state["worker_chunks"].tolist(),
+                                                        state["worker_resamples"].tolist(),
+                                                        state["worker_seconds"].tolist()))
+
+    def iterations(self) -> np.ndarray:
+        return np.concatenate([np.empty(0, dtype=int)] + self.__iterations)
+
+    def seconds(self) -> np.ndarray:
+        return np.concatenate([np.empty(0)] + self.__seconds)
+
+    def failures(self) -> pd.Series:
+        return pd.Series(dict(self.__failures), dtype=int, name="failures").sort_index()
+
+    def workers(self) -> pd.DataFrame:
+        workers = pd.DataFrame.from_dict(self.__workers, orient="index", columns=["chunks", "resamples", "seconds"])
+        workers.loc[:, "resamples_per_second"] = workers.loc[:, "resamples"] / workers.loc[:, "seconds"]
+        return workers
+
+
+def _prefixed(prefix: str, state: dict) -> dict:
+    return {prefix + "." + key: value for key, value in state.items()}
+
+
+def _unprefixed(prefix: str, state: dict) -> dict:
+    return {key[len(prefix) + 1:]: value for key, value in state.items() if key.startswith(prefix + ".")}
+
+
+# Whether resamples that can be estimated together in batches are, rather than one at a time as for other data. Both
+# give the same results; turning batching off is only useful to compare the two.
+_BATCHED = True
+
+# Minimum number of seconds between two checkpoints written part way through a round.
+_CHECKPOINT_SECONDS = 60
+
+
+def _fingerprint(config: c.Config, calculator: WeightsCalculatorFactory, labels: dict, originals: list) -> str:
+    # Identifies the model a bootstrap is run for, so that progress saved for one model is never resumed for another:
+    # the labels of the statistics, the modes, scales and scheme, and the original estimates. These are rounded so that
+    # rounding errors in estimating the same model again (with another number of BLAS threads, say) do not matter.
+    lvs = list(config.path())
+    scales = [str(config.scale(mv)) for lv in lvs for mv in config.mvs(lv)]
+    model = [labels, [str(config.mode(lv)) for lv in lvs], scales, config.scaled(), str(calculator.scheme())]
+    digest = hashlib.sha256(repr(model).encode())
+    for original in originals:
+        digest.update(np.round(np.asarray(original, dtype=np.float64), 6).tobytes())
+    return digest.hexdigest()
+
+
+class _Checkpoint:
+    """Internal class that persists the progress of a bootstrap to an npz file, so that it can be resumed.
+
+    The file holds the merged draws (or their running summaries) and accounting of the completed chunks, the round and
+    size of each completed chunk, the entropy the random streams are spawned from, the stability of the estimates
+    after each completed round, and the fingerprint of the model (see :func:`_fingerprint`). It is rewritten under a
+    temporary name and then renamed, so that a bootstrap killed while saving leaves the previous checkpoint intact.
+    """
+    def __init__(self, path: str, labels: dict, streaming: bool, bayesian: bool, subsample: int, fingerprint: str):
+        self.__path = path
+        self.__fingerprint = fingerprint
+        self.__parameters = np.array([len(labels[statistic]) for statistic in labels])
+        self.__settings = np.array([streaming, bayesian, subsample or 0])
+        self.__entropy = None
+        self.__saved = time.monotonic()
+
+    def resume(self, seed: int, plan: list, draws, accounting: _Accounting):
+        """Internal method that restores the draws and accounting from the checkpoint, if there is one.
+
+        Returns the entropy to spawn the random streams from, the (round, size) of the chunks that were completed and
+        the stability of the estimates after each completed round.
+        """
+        self.__entropy = np.random.SeedSequence(seed).entropy
+        if not os.path.exists(self.__path):
+            return self.__entropy, [], []
+        with np.load(self.__path) as checkpoint:
+            state = {key: checkpoint[key] for key in checkpoint.files}
+        completed = [tuple(chunk) for chunk in state["completed"].tolist()]
+        if (seed is not None and int(state["entropy"]) != self.__entropy) or completed != plan[:len(completed)] \
+                or not np.array_equal(state["settings"], self.__settings) \
+                or not np.array_equal(state["parameters"], self.__parameters) \
+                or str(state.get("fingerprint")) != self.__fingerprint:
+            raise Exception("The bootstrap checkpoint at " + self.__path +
+                            " was written with a different seed, model or bootstrap settings")
+        self.__entropy = int(state["entropy"])
+        draws.restore(_unprefixed("draws", state))
+        accounting.restore(_unprefixed("accounting", state))
+        return self.__entropy, completed, list(state["stability"])
+
+    def due(self) -> bool:
+        return time.monotonic() - self.__saved >= _CHECKPOINT_SECONDS
+
+    def save(self, completed: list, stability: list, draws, accounting: _Accounting):
+        state = {
+            "entropy": np.array(str(self.__entropy)),
+            "completed": np.array(completed, dtype=int).reshape(-1, 2),
+            "stability": np.array(stability, dtype=float).reshape(len(stability), -1 if stability else 0),
+            "settings": self.__settings,
+            "parameters": self.__parameters,
+            "fingerprint": np.array(self.__fingerprint),
+        }
+        state.update(_prefixed("draws", draws.state()))
+        state.update(_prefixed("accounting", accounting.state()))
+        with open(self.__path + ".tmp", "wb") as file:
+            np.savez(file, **state)
+        os.replace(self.__path + ".tmp", self.__path)
+        self.__saved = time.monotonic()
+
+
+class _DrawStore:
+    """Internal class that keeps the raw bootstrap draws of each statistic as float32 arrays, with a row per successful
+    resample in chunk order, either in memory or in .npy files in a directory, which are memory-mapped so that the draws
+    of a large bootstrap do not have to fit in memory. Room is made for every resample that could be drawn up front.
+
+    The directory also holds a labels.npz file with the column labels of each statistic, the number of rows filled and
+    the fingerprint of the model (see :func:`_fingerprint`), which is written when the files are opened and again once
+    the bootstrap is done, so that the draws can be reopened with :func:`load_draws`, and are only filled in further
+    for the same model."""
+    def __init__(self, labels: dict, resamples: int, path: str = None, fingerprint: str = None):
+        self.__labels = labels
+        self.__fingerprint = fingerprint
+        self.__resamples = resamples
+        self.__path = path
+        self.__arrays = {}
+        self.__count = 0
+
+    def open(self, count: int, state: dict = None):
+        """Internal method that allocates the arrays, keeping the first ``count`` rows of a bootstrap resumed from a
+        checkpoint. These are reopened from the directory if it holds them, or else taken from the state of the draws
+        restored from the checkpoint (``None`` if they were only kept as summaries)."""
+        reopen = count > 0 and self.__path is not None and all(
+            os.path.exists(self.__file(statistic)) for statistic in self.__labels)
+        if count > 0 and not reopen and state is None:
+            raise Exception("The draws of the resamples restored from the bootstrap checkpoint were not kept, so the "
+                            "bootstrap cannot be resumed while keeping its draws.")
+        if reopen and self.__kept_fingerprint() != self.__fingerprint:
+            raise Exception("The bootstrap draws in " + self.__path + " were kept for a different model.")
+        if self.__path is not None:
+            os.makedirs(self.__path, exist_ok=True)
+        for statistic, labels in self.__labels.items():
+            shape = (self.__resamples, len(labels))
+            array, previous = None, state[statistic] if count > 0 and not reopen else None
+            if reopen:
+                array = np.load(self.__file(statistic), mmap_mode="r+")
+                if array.shape[1] != shape[1] or array.shape[0] < count:
+                    raise Exception("The bootstrap draws in " + self.__path + " were kept for a different model.")
+                if array.shape[0] != shape[0]:
+                    # The bootstrap is being extended to more resamples, so the files have to be made bigger.
+                    array, previous = None, np.array(array[:count, :])
+            if array is None and self.__path is not None:
+                array = np.lib.format.open_memmap(self.__file(statistic), mode="w+", dtype=np.float32, shape=shape)
+            elif array is None:
+                array = np.empty(shape, dtype=np.float32)
+            if previous is not None:
+                array[:count, :] = previous
+            self.__arrays[statistic] = array
+        self.__count = count
+        self.__write_labels()
+
+    def add(self, draws: dict):
+        rows = next(iter(draws.values())).shape[0]
+        for statistic, array in self.__arrays.items():
+            array[self.__count:self.__count + rows, :] = draws[statistic]
+        self.__count += rows
+
+    def close(self):
+        if self.__path is None:
+            return
+        for array in self.__arrays.values():
+            array.flush()
+        self.__write_labels()
+
+    def draws(self) -> dict:
+        return {statistic: pd.DataFrame(array[:self.__count, :], columns=self.__labels[statistic], copy=False)
+                for statistic, array in self.__arrays.items()}
+
+    def __file(self, statistic: str) -> str:
+        return os.path.join(self.__path, statistic + ".npy")
+
+    def __kept_fingerprint(self) -> str:
+        # The fingerprint of the model the draws in the directory were kept for, if it is known.
+        if not os.path.exists(os.path.join(self.__path, "labels.npz")):
+            return None
+        with np.load(os.path.join(self.__path, "labels.npz")) as labels:
+            return str(labels["fingerprint"]) if "fingerprint" in labels.files else None
+
+    def __write_labels(self):
+        if self.__path is None:
+            return
+        labels = {statistic: np.array(labels, dtype=str) for statistic, labels in self.__labels.items()}
+        with open(os.path.join(self.__path, "labels.npz.tmp"), "wb") as file:
+            np.savez(file, rows=np.array(self.__count), fingerprint=np.array(str(self.__fingerprint)), **labels)
+        os.replace(os.path.join(self.__path, "labels.npz.tmp"), os.path.join(self.__path, "labels.npz"))
+
+
+def load_draws(path: str) -> dict:
+    """Reopens the raw bootstrap draws kept in a directory (see the ``keep_draws`` argument of :class:`Bootstrap`),
+    without reading them into memory.
+
+    Args:
+        path: The directory the draws were kept in.
+
+    Returns:
+        a dict from the name of each statistic (weights, r_squared, total_effects, paths, loadings and htmt, if it was
+        bootstrapped) to a read-only DataFrame of float32 draws backed by a memory-mapped file, with a row per
+        successful resample and a column per parameter
+    """
+    with np.load(os.path.join(path, "labels.npz")) as labels:
+        rows = int(labels["rows"])
+        columns = {statistic: list(labels[statistic]) for statistic in labels.files
+                   if statistic not in ("rows", "fingerprint")}
+    return {statistic: pd.DataFrame(np.load(os.path.join(path, statistic + ".npy"), mmap_mode="r")[:rows, :],
+                                    columns=labels, copy=False) for statistic, labels in columns.items()}
+
+def _collect(queue: Queue, processes: list):
+    # Block until the next worker reports. The timeout only bounds how long it takes to notice a worker that died
+    # without reporting (e.g. killed by the OS); results are picked up as soon as they are put on the queue.
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except Empty:
+            crashed = [process for process in processes if process.exitcode not in (None, 0)]
+            if crashed:
+                raise Exception("Bootstrap process exited unexpectedly with exit code " + str(crashed[0].exitcode))
+
+
+class _SharedData:
+    """Internal class that holds the dataset in a shared memory block so that bootstrap workers can resample it
+    without each receiving their own copy."""
+    def __init__(self, data: pd.DataFrame):
+        values = data.values.astype(np.float64)
+        self.__memory = SharedMemory(create=True, size=max(values.nbytes, 1))
+        self.__name = self.__memory.name
+        self.__shape = values.shape
+        self.__index = data.index
+        self.__columns = data.columns
+        np.ndarray(self.__shape, dtype=np.float64, buffer=self.__memory.buf)[:] = values
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_SharedData__memory"] = None
+        return state
+
+    def attach(self) -> pd.DataFrame:
+        """Internal method that returns a read-only DataFrame backed by the shared memory block."""
+        if self.__memory is None:
+            self.__memory = SharedMemory(name=self.__name)
+        values = np.ndarray(self.__shape, dtype=np.float64, buffer=self.__memory.buf)
+        values.flags.writeable = False
+        return pd.DataFrame(values, index=self.__index, columns=self.__columns, copy=False)
+
+    def detach(self):
+        """Internal method that closes this process's handle on the shared memory block."""
+        self.__memory.close()
+
+    def unlink(self):
+        """Internal method that releases the shared memory block once all workers are done with it."""
+        self.__memory.close()
+        self.__memory.unlink()
+
+
+def _draw(random: np.random.Generator, observations: int, size: int, bayesian: bool) -> Tuple[np.ndarray, np.ndarray]:
+    # The positions of the observations in a resample of the given size, and the number of times each occurs. The
+    # Bayesian bootstrap draws continuous weights for every observation from a flat Dirichlet distribution instead,
+    # scaled so that like the counts they add up to the number of observations.
+    if bayesian:
+        return np.arange(observations), observations * random.dirichlet(np.ones(observations))
+    drawn, counts = np.unique(random.integers(observations, size=size), return_counts=True)
+    return drawn, counts.astype(np.float64)
+
+
+def _frequencies(random: np.random.Generator, observations: int, size: int, bayesian: bool) -> np.ndarray:
+    # The number of times each observation occurs in a resample of the given size (see _draw).
+    drawn, counts = _draw(random, observations, size, bayesian)
+    frequencies = np.zeros(observations)
+    frequencies[drawn] = counts
+    return frequencies
+
+
+class _MomentStatistics:
+    """Internal class that calculates the inner model and loadings of a stack of resamples from the covariance matrices
+    of their latent variable scores and the correlations between their manifest variables and scores, with rows and
+    columns in the order of the outer design matrix. If the labels include HTMT, the ratios are calculated from the
+    correlations between the manifest variables."""
+    def __init__(self, config: c.Config, inner_model: im.InnerModel, labels: dict):
+        path = config.path()
+        lvs = list(path)
+        odm = config.blocks(path)
+        mvs = odm.mvs()
+        lv_of_mv = {mv: lvs.index(lv) for lv in lvs for mv in config.mvs(lv)}
+        # MVs that are not in the model being estimated (those replaced by the scores of their LV in a second stage
+        # estimation of higher order constructs) have no loading.
+        self.__loadings = len(labels["loadings"])
+        self.__loading_columns = [i for i, mv in enumerate(labels["loadings"]) if mv in lv_of_mv and mv in mvs]
+        self.__loading_rows = [mvs.index(labels["loadings"][i]) for i in self.__loading_columns]
+        self.__loading_lvs = [lv_of_mv[labels["loadings"][i]] for i in self.__loading_columns]
+        self.__r_squared_lvs = [lvs.index(lv) for lv in labels["r_squared"]]
+        effects = inner_model.effects()
+        self.__effect_to = [lvs.index(effects.loc[effect, "to"]) for effect in labels["paths"]]
+        self.__effect_from = [lvs.index(effects.loc[effect, "from"]) for effect in labels["paths"]]
+        self.__regressions = [(lvs.index(dv), (path.loc[dv, :] == 1).values) for dv in lvs if path.loc[dv, :].sum() > 0]
+        self.__htmt = Htmt(odm) if "htmt" in labels else None
+
+    def calculate(self, covariance: np.ndarray, cor: np.ndarray, mv_cor: np.ndarray) -> dict:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            paths = np.zeros_like(covariance)
+            r_squared = np.zeros(covariance.shape[:2])
+            for dv, ivs in self.__regressions:
+                coefficients = np.matmul(np.linalg.pinv(covariance[:, ivs, :][:, :, ivs]),
+                                         covariance[:, ivs, dv, np.newaxis])[:, :, 0]
+                paths[:, dv, ivs] = coefficients
+                r_squared[:, dv] = (coefficients * covariance[:, ivs, dv]).sum(axis=1) / covariance[:, dv, dv]
+            total_effects = paths.copy()
+            power = paths
+            for i in range(2, paths.shape[1] + 1):
+                power = np.matmul(power, paths)
+                total_effects = total_effects + power
+            direct = paths[:, self.__effect_to, self.__effect_from]
+            total = total_effects[:, self.__effect_to, self.__effect_from]
+            # Match InnerModel, which only reports effects along paths with a non-zero total effect.
+            direct[total == 0] = np.nan
+            total[total == 0] = np.nan
+            loadings = np.full((cor.shape[0], self.__loadings), np.nan)
+            loadings[:, self.__loading_columns] = cor[:, self.__loading_rows, self.__loading_lvs]
+        results = {
+            "r_squared": r_squared[:, self.__r_squared_lvs],
+            "total_effects": total,
+            "paths": direct,
+            "loadings": loadings,
+        }
+        if self.__htmt is not None:
+            results["htmt"] = self.__htmt.calculate(mv_cor)
+        return results
+
+
+class _Resampler:
+    """Internal class that estimates the model separately on each resample.
+
+    For metric data, each resample is estimated from the frequency of each observation in it rather than from a copy of
+    the rows drawn (see :meth:`.Estimator.estimate`). Nonmetric data has to be quantified from the rows actually drawn,
+    so they are copied. Either way, the statistics are calculated by :class:`_MomentStatistics` from a single covariance
+    matrix of the MVs and scores, rather than by building an :class:`.InnerModel` for each resample."""
+    def __init__(self, config: c.Config, data: pd.DataFrame, inner_model: im.InnerModel,
+                 calculator: WeightsCalculatorFactory, labels: dict, initial_weights: pd.DataFrame,
+                 bayesian: bool = False, subsample: int = None):
         self.__config = config
         self.__data = data
-        self.__inner_model = inner_model
         self.__calculator = calculator
-        self.__iterations = iterations
+        self.__labels = labels
+        self.__initial_weights = initial_weights
+        self.__bayesian = bayesian
+        self.__subsample = subsample
+        odm = config.blocks(config.path())
+        self.__mvs, self.__lvs = odm.mvs(), odm.lvs()
+        self.__estimator = Estimator(config)
+        self.__statistics = _MomentStatistics(config, inner_model, labels)
+        # Ordinal and nominal MVs are encoded once, and each resample only picks the codes of the observations drawn.
+        self.__codes = None if config.metric() else config.categorical_codes(data)
 
-    def run(self):
-        weights = pd.DataFrame(columns=self.__data.columns)
-        r_squared = pd.DataFrame(columns=self.__inner_model.r_squared().index)
-        total_effects = pd.DataFrame(columns=self.__inner_model.effects().index)
-        paths = pd.DataFrame(columns=self.__inner_model.effects().index)
-        loadings = pd.DataFrame(columns=self.__data.columns)
+    def __estimate_metric(self, frequencies: np.ndarray) -> dict:
+        data = self.__data
+        if self.__subsample is not None:
+            # A small subsample leaves most observations out, so it is cheaper to only keep the ones that were drawn.
+            drawn = np.flatnonzero(frequencies)
+            data, frequencies = data.iloc[drawn, :], frequencies[drawn]
+        _final_data, _scores, _weights = self.__estimator.estimate(self.__calculator, data, self.__initial_weights,
+                                                                   frequencies)
+        values = np.hstack([_final_data.loc[:, self.__mvs].values, _scores.loc[:, self.__lvs].values])
+        return self.__statistics_of(util.weighted_cov(values, frequencies), _weights)
+
+    def __estimate_nonmetric(self, boot_observations: np.ndarray) -> dict:
+        codes = {mv: (mv_codes[boot_observations], categories) for mv, (mv_codes, categories) in self.__codes.items()}
+        _final_data, _scores, _weights = self.__estimator.estimate(self.__calculator, self.__data.iloc[boot_observations, :],
+                                                                   self.__initial_weights, codes=codes)
+        values = np.hstack([_final_data.loc[:, self.__mvs].values, _scores.loc[:, self.__lvs].values])
+        if np.isnan(values).any():
+            # Quantified data can still have missing values, for which correlations are computed from the pairs of
+            # values that are both present, as pandas does.
+            values = pd.DataFrame(values)
+            return self.__statistics_of(values.cov().values, _weights, values.corr().values)
+        return self.__statistics_of(np.cov(values, rowvar=False), _weights)
+
+    def __statistics_of(self, covariance: np.ndarray, weights: pd.DataFrame, cor: np.ndarray = None) -> dict:
+        # The statistics of a resample from the covariance (and correlation) matrix of its MVs and LV scores, in the
+        # order of the outer design matrix.
+        covariance = covariance[np.newaxis, :, :]
+        cor = util.cov_to_corr(covariance) if cor is None else cor[np.newaxis, :, :]
+        mvs = len(self.__mvs)
+        values = self.__statistics.calculate(covariance[:, mvs:, mvs:], cor[:, :mvs, mvs:], cor[:, :mvs, :mvs])
+        values = {statistic: pd.Series(value[0], index=self.__labels[statistic]) for statistic, value in values.items()}
+        values["weights"] = weights.loc[:, "weight"]
+        return values
 
+    def resample(self, random: np.random.Generator, iterations: int) -> dict:
+        # Each statistic is written into a preallocated row per successful resample, so the cost of recording a
+        # resample does not grow with the number of resamples already drawn.
+        draws = {statistic: np.full((iterations, len(labels)), np.nan) for statistic, labels in self.__labels.items()}
+        iterations_used = np.zeros(iterations, dtype=int)
+        seconds = np.zeros(iterations)
+        failures = collections.Counter()
         observations = self.__data.shape[0]
-        estimator = Estimator(self.__config)
-        for i in range(0, self.__iterations):
+        size = self.__subsample or observations
+        succeeded = 0
+        for i in range(0, iterations):
+            start = time.perf_counter()
             try:
-                boot_observations = np.random.randint(observations, size=observations)
-                _final_data, _scores, _weights = estimator.estimate(self.__calculator, self.__data.iloc[boot_observations, :])
-                weights = weights.append(_weights.T, ignore_index=True)
-                inner_model = im.InnerModel(self.__config.path(), _scores)
-                r_squared = r_squared.append(inner_model.r_squared().T, ignore_index=True)
-                total_effects = total_effects.append(inner_model.effects().loc[:, "total"].T, ignore_index=True)
-                paths = paths.append(inner_model.effects().loc[:, "direct"].T, ignore_index=True)
-                loadings = loadings.append(
-                    (_scores.apply(lambda s: _final_data.corrwith(s)) * self.__config.odm(self.__config.path())).sum(axis=1), ignore_index=True)
-            except:
-                pass
-        results = {}
-        results["weights"] = weights
-        results["r_squared"] = r_squared
-        results["total_effects"] = total_effects
-        results["paths"] = paths
-        results["loadings"] = loadings
-        self.__queue.put(results)
+                if self.__config.metric():
+                    values = self.__estimate_metric(_frequencies(random, observations, size, self.__bayesian))
+                else:
+                    values = self.__estimate_nonmetric(random.integers(observations, size=size))
+                for statistic, value in values.items():
+                    draws[statistic][succeeded, :] = value.reindex(self.__labels[statistic]).values
+                iterations_used[succeeded] = self.__estimator.iterations()
+                seconds[succeeded] = time.perf_counter() - start
+                succeeded += 1
+            except Exception as e:
+                failures[type(e).__name__] += 1
+        results = {statistic: draw[:succeeded, :] for statistic, draw in draws.items()}
+        results["iterations"] = iterations_used[:succeeded]
+        results["seconds"] = seconds[:succeeded]
+        results["failures"] = failures
+        return results
+
+
+class _BatchedResampler:
+    """Internal class that estimates the model on a whole chunk of resamples at once. Only suitable for metric data
+    without missing values or higher order constructs.
+
+    Each resample is reduced to the covariance matrix of its treated data, the weights are estimated for all the
+    resamples together (see :meth:`.WeightsCalculatorFactory.calculate_batched`), and the statistics are then derived
+    from the covariance matrices of the latent variable scores rather than from the scores themselves."""
+    def __init__(self, config: c.Config, data: pd.DataFrame, inner_model: im.InnerModel,
+                 calculator: WeightsCalculatorFactory, labels: dict, initial_weights: pd.DataFrame,
+                 bayesian: bool = False, subsample: int = None):
+        path = config.path()
+        odm = config.blocks(path)
+        mvs = odm.mvs()
+        self.__order = [list(data.columns).index(mv) for mv in mvs]
+        self.__weight_rows = [mvs.index(mv) for mv in labels["weights"]]
+        self.__statistics = _MomentStatistics(config, inner_model, labels)
+        self.__config = config
+        self.__data = data
+        self.__calculator = calculator
+        self.__initial_weights = initial_weights
+        self.__bayesian = bayesian
+        self.__subsample = subsample
+        self.__path = path
+        self.__odm = odm
+        # The means of the data, computed for the first chunk of resamples (the jackknife only needs the moments).
+        self.__means = None
+
+    def resample(self, random: np.random.Generator, iterations: int) -> dict:
+        start = time.perf_counter()
+        if self.__means is None:
+            self.__values, self.__means = self.__config.metric_values(self.__data)
+        observations = self.__values.shape[0]
+        # Only the observations drawn are kept, so a small subsample of a large dataset is cheap to estimate.
+        draws = [_draw(random, observations, self.__subsample or observations, self.__bayesian)
+                 for _ in range(0, iterations)]
+        return self.estimate(self.__config.drawn_moments(self.__values, self.__means, draws), start)
+
+    def estimate(self, moments: np.ndarray, start: float) -> dict:
+        """Internal method that estimates the model on a stack of resamples, given the covariance matrices of their
+        treated data (with rows and columns in the order of the dataset's columns), for instance from
+        :meth:`.Config.drawn_moments`. The time taken is measured from ``start``."""
+        iterations = moments.shape[0]
+        moments = moments[:, self.__order, :][:, :, self.__order]
+        weights, w_sign, converged, iterations_used = self.__calculator.calculate_batched(moments, self.__path,
+                                                                                          self.__initial_weights)
+        moments, weights, w_sign = moments[converged], weights[converged], w_sign[converged]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Covariance of the (sign corrected) scores, from which the inner model regressions can be computed.
+            cross, covariance = self.__odm.covariance(moments, weights)
+            covariance = covariance * w_sign[:, :, np.newaxis] * w_sign[:, np.newaxis, :]
+            # The scores are standardised, so the correlations only need scaling by the MVs' standard deviations.
+            std = np.sqrt(np.diagonal(moments, axis1=1, axis2=2))
+            cor = cross * w_sign[:, np.newaxis, :] / std[:, :, np.newaxis]
+        results = self.__statistics.calculate(covariance, cor, util.cov_to_corr(moments))
+        failures = collections.Counter()
+        if not converged.all():
+            failures[ConvergenceError.__name__] = int((~converged).sum())
+        # The resamples are estimated together, so each is charged an equal share of the time taken by the chunk.
+        seconds = np.full(int(converged.sum()), (time.perf_counter() - start) / iterations)
+        results.update({
+            "weights": weights[:, self.__weight_rows],
+            "iterations": iterations_used[converged],
+            "seconds": seconds,
+            "failures": failures,
+        })
+        return results
+
+
+def _stability(draws, originals: dict) -> np.ndarray:
+    # The estimates that have to settle down before an adaptive bootstrap stops, as they will be reported. For the m out
+    # of n bootstrap, the percentiles are shrunk around the original estimates, so these are needed too.
+    return np.concatenate([draws.summary(statistic, originals[statistic]).loc[:, ["std.error", "perc.025", "perc.975"]]
+                           .values.ravel() for statistic in ["paths", "weights", "loadings"]])
+
+
+def _worker_name() -> str:
+    process, thread = current_process(), threading.current_thread()
+    if thread is threading.main_thread():
+        return process.name
+    if process.name == "MainProcess":
+        return thread.name
+    return process.name + "/" + thread.name
+
+
+# Below this many multiply-adds in the largest matrix product of a resample (the n x p by p x p cross-product of the
+# data), waking extra BLAS threads costs more than it saves, so cores are better spent on more workers.
+_BLAS_WORK_PER_THREAD = 1e8
+
+
+def _parallelism(workers: int, blas_threads: Union[int, str], observations: int, variables: int) -> Tuple[int, int]:
+    """Internal function that returns the number of workers and of BLAS threads per worker to use.
+
+    With ``blas_threads="auto"``, the cores are split between workers and BLAS threads according to the size of the
+    model: one BLAS thread per worker for all but the largest datasets. If the number of workers is given, the cores are
+    shared out between them instead.
+    """
+    cores = os.cpu_count() or 1
+    if blas_threads != "auto":
+        return workers or cores, blas_threads
+    if workers is None:
+        threads = int(min(cores, max(1, observations * variables ** 2 // _BLAS_WORK_PER_THREAD)))
+        return max(1, cores // threads), threads
+    return workers, max(1, cores // workers)
+
+
+def _executor_parallelism(executor: Union[str, Executor], workers: int, blas_threads: Union[int, str],
+                          observations: int, variables: int) -> Tuple[int, int]:
+    """Internal function that returns the number of workers and of BLAS threads per worker to use with an executor (see
+    :func:`_parallelism`). An executor passed in by the caller has the workers it was created with, whatever number was
+    asked for. If that cannot be told, the number of workers is ``None`` and ``"auto"`` leaves BLAS alone.
+    """
+    if isinstance(executor, WorkerPool):
+        workers = executor.processes()
+    elif isinstance(executor, Executor):
+        workers = getattr(executor, "_max_workers", None)
+        if workers is None:
+            return None, None if blas_threads == "auto" else blas_threads
+    return _parallelism(workers, blas_threads, observations, variables)
+
+
+def _blas_limits(threads: int):
+    # Limits the number of threads BLAS uses in this process, or leaves it alone if no limit was given.
+    return contextlib.nullcontext() if threads is None else threadpool_limits(limits=threads, user_api="blas")
+
+
+class _Job:
+    """Internal class that holds everything needed to draw a chunk of resamples. It is callable with the index, size and
+    seed of a chunk, so that it can be submitted to any :class:`concurrent.futures.Executor`.
+
+    Each worker thread builds the resampler of a job once, for its first chunk, and keeps it on the job for the job's
+    later chunks, so that it is released along with the job: once the bootstrap is done, or once the job drops out of
+    the cache of a :class:`.WorkerPool`'s workers. Other process pools are sent a new copy of the job, dataset included,
+    with every chunk, so they build a resampler per chunk."""
+    def __init__(self, config: c.Config, data, inner_model: im.InnerModel, calculator: WeightsCalculatorFactory,
+                 labels: dict, batched: bool, initial_weights: pd.DataFrame, streaming: bool, bayesian: bool,
+                 subsample: int = None, blas_threads: int = None, keep_draws: bool = False):
+        self.__parent = os.getpid()
+        # Resamplers are not shared between threads, since their estimators keep the state of the last estimation.
+        self.__resamplers = threading.local()
+        self.__blas_threads = blas_threads
+        self.__config = config
+        self.__data = data
+        self.__inner_model = inner_model
+        self.__calculator = calculator
+        self.__labels = labels
+        self.__batched = batched
+        self.__initial_weights = initial_weights
+        self.__streaming = streaming
+        self.__bayesian = bayesian
+        self.__subsample = subsample
+        self.__keep_draws = keep_draws
+
+    def __getstate__(self):
+        # Each worker builds its own resamplers.
+        state = self.__dict__.copy()
+        del state["_Job__resamplers"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__resamplers = threading.local()
+
+    def data(self):
+        return self.__data
+
+    def blas_limits(self):
+        return _blas_limits(self.__blas_threads)
+
+    def resampler(self, data: pd.DataFrame):
+        return (_BatchedResampler if self.__batched else _Resampler)(self.__config, data, self.__inner_model,
+                                                                     self.__calculator, self.__labels,
+                                                                     self.__initial_weights, self.__bayesian,
+                                                                     self.__subsample)
+
+    def run(self, resampler, index: int, iterations: int, seed: np.random.SeedSequence) -> tuple:
+        draws = (_StreamingDraws if self.__streaming else _Draws)(self.__labels)
+        start = time.perf_counter()
+        results = resampler.resample(np.random.default_rng(seed), iterations)
+        # The raw draws are kept before the streaming summaries replace them.
+        kept = {statistic: results[statistic].astype(np.float32) for statistic in self.__labels} \
+            if self.__keep_draws else None
+        results = draws.prepare(results)
+        if kept is not None:
+            results["draws"] = kept
+        results.update(worker=_worker_name(), resamples=iterations, elapsed=time.perf_counter() - start)
+        return index, results
+
+    def __cached_resampler(self):
+        # Building a resampler encodes nonmetric data and prepares the statistics, which only needs doing once per
+        # worker rather than for every chunk.
+        if not hasattr(self.__resamplers, "resampler"):
+            data = self.__data.get() if isinstance(self.__data, _Shared) else self.__data
+            self.__resamplers.resampler = self.resampler(data)
+        return self.__resamplers.resampler
+
+    def __call__(self, index: int, iterations: int, seed: np.random.SeedSequence) -> tuple:
+        # BLAS threads are limited by the bootstrap itself in its own process (the limit applies to the whole process,
+        # so it cannot be set per thread), and by the job in any other.
+        with self.blas_limits() if os.getpid() != self.__parent else contextlib.nullcontext():
+            return self.run(self.__cached_resampler(), index, iterations, seed)
+
+
+def _run_shared(job: _Shared, index: int, iterations: int, seed: np.random.SeedSequence) -> tuple:
+    return job.get()(index, iterations, seed)
+
+
+class BootstrapProcess(Process):
+    def __init__(self, tasks: Queue, queue: Queue, job: _Job):
+        super(BootstrapProcess, self).__init__()
+        self.__tasks = tasks
+        self.__queue = queue
+        self.__job = job
+
+    def run(self):
+        # Pull chunks of resamples until we are told to stop, reporting back exactly once per chunk so that the parent
+        # can block on one result per chunk. Any failure outside an individual resample is reported in place of a chunk.
+        shared = isinstance(self.__job.data(), _SharedData)
+        try:
+            data = self.__job.data().attach() if shared else self.__job.data()
+            resampler = self.__job.resampler(data)
+            with self.__job.blas_limits():
+                while True:
+                    chunk = self.__tasks.get()
+                    if chunk is None:
+                        break
+                    self.__queue.put((self.__job.run(resampler, *chunk), None))
+        except BaseException:
+            self.__queue.put((None, traceback.format_exc()))
+        finally:
+            if shared:
+                data = resampler = None
+                self.__job.data().detach()
+
+
+class _ProcessBackend:
+    """Internal class that draws chunks of resamples in dedicated worker processes, which pull chunks from a queue."""
+    def __init__(self, job: _Job, workers: int):
+        self.__tasks = Queue()
+        self.__queue = Queue()
+        self.__processes = []
+        for t in range(0, workers):
+            process = BootstrapProcess(self.__tasks, self.__queue, job)
+            process.start()
+            self.__processes.append(process)
+
+    def submit(self, index: int, iterations: int, seed: np.random.SeedSequence):
+        self.__tasks.put((index, iterations, seed))
+
+    def collect(self) -> tuple:
+        results, error = _collect(self.__queue, self.__processes)
+        if error is not None:
+            raise Exception("Bootstrapping failed in a worker process:\n" + error)
+        return results
+
+    def close(self, finished: bool):
+        if finished:
+            for process in self.__processes:
+                self.__tasks.put(None)
+            for process in self.__processes:
+                process.join()
+        for process in self.__processes:
+            if process.is_alive():
+                process.terminate()
+
+
+class _ExecutorBackend:
+    """Internal class that submits each chunk of resamples to an executor, such as a thread or process pool. Executors
+    passed in by the caller are left running; the built-in thread pool is shut down once the bootstrap is done."""
+    def __init__(self, job, executor: Executor, owned: bool):
+        self.__job = job
+        self.__executor = executor
+        self.__owned = owned
+        self.__futures = set()
+
+    def submit(self, index: int, iterations: int, seed: np.random.SeedSequence):
+        self.__futures.add(self.__executor.submit(self.__job, index, iterations, seed))
+
+    def collect(self) -> tuple:
+        done, _ = wait(self.__futures, return_when=FIRST_COMPLETED)
+        future = done.pop()
+        self.__futures.remove(future)
+        return future.result()
+
+    def close(self, finished: bool):
+        for future in self.__futures:
+            future.cancel()
+        if self.__owned:
+            self.__executor.shutdown(wait=True)
 
 
 class Bootstrap:
     """Performs bootstrap validation to determine the statistical significance of the model.
 
     Setting ``bootstrap=True`` when constructing :class:`.Plspm` will perform bootstrap validation. Calling :meth:`~.Plspm.bootstrap` on :class:`.Plspm` will return an instance of this class, from which the bootstrapping results can be retrieved by calling the methods listed below.
+
+    Resamples are split into chunks of ``chunk_size`` which idle workers pull from a queue. By default (``executor`` is
+    ``"processes"``) the workers are ``num_processes`` dedicated processes; with ``"threads"`` they are threads of this
+    process, which is cheaper to start and works well because most of the time goes on NumPy code that releases the GIL;
+    any other :class:`concurrent.futures.Executor` can also be passed in, in which case it is left running afterwards.
+    A :class:`.WorkerPool` keeps its processes, and the datasets they have been sent, warm across many models.
+
+    Most of the time goes on NumPy, whose BLAS library may start a thread per core in every worker, oversubscribing the
+    cores. ``blas_threads`` limits the number of BLAS threads per worker (one is usually best); ``"auto"``, the default,
+    splits the cores between workers and BLAS threads according to the size of the model, and ``None`` leaves BLAS
+    alone. ``shared_memory`` only applies to the dedicated processes. The number of workers defaults to the number of
+    cores. Each chunk draws from its own random stream spawned from ``seed``, so for a given seed the results are the
+    same whatever the number or kind of workers. For metric data without missing values or higher order constructs, all
+    the resamples in a chunk are estimated together by a batched engine. With ``warm_start``, the estimation of each
+    resample starts from the weights estimated on the full dataset rather than from unit weights. With ``streaming``,
+    the draws are not kept: each chunk is reduced to running moments and a quantile sketch which are merged as chunks
+    complete, so the percentiles are approximate once there are more than a few hundred resamples.
+
+    With a ``tolerance``, resampling is adaptive: resamples are drawn in rounds of ``round_size`` until the standard
+    errors and percentile bounds of the paths, weights and loadings change by less than the tolerance from one round to
+    the next, or until ``iterations`` resamples have been drawn.
+
+    With ``bayesian``, each resample weights the observations with weights drawn from a flat Dirichlet distribution
+    (Rubin's Bayesian bootstrap) rather than drawing observations with replacement. This is only supported for metric
+    data, which is never copied per resample: it is estimated from the frequency (or weight) of each observation.
+
+    With a ``subsample`` size m, each resample draws m rather than n observations (the m out of n bootstrap), so the
+    cost of a resample scales with m rather than with the size of the dataset. The dispersion of the draws is then
+    shrunk by sqrt(m / n) around the original estimates: the standard errors are scaled by sqrt(m / n), as are the
+    distances of the mean and percentiles from the original estimate.
+
+    With a ``checkpoint`` path, the progress of the bootstrap is saved to an npz file at the end of each round, and at
+    most once a minute part way through a round. If the file already exists, the bootstrap resumes from the chunks it
+    holds, giving the same results as an uninterrupted bootstrap with the same seed. A checkpoint can also be used to
+    extend a bootstrap to more resamples, as long as the chunks already drawn are the first chunks of the new one. A
+    checkpoint (or a directory of kept draws) written for another model is refused rather than resumed.
+
+    With ``htmt``, the heterotrait-monotrait ratios of the original estimates, the ratios are bootstrapped too, from the
+    correlations between the MVs of each resample (see :meth:`htmt`).
+
+    With ``keep_draws``, the raw draws are kept as float32 arrays, so that they can be analysed further (see
+    :meth:`draws`) without bootstrapping again. If ``keep_draws`` is a directory rather than ``True``, they are written
+    to memory-mapped .npy files in it, which can be reopened later with :func:`load_draws`. A bootstrap resumed from a
+    checkpoint carries on filling the files left in the directory.
     """
     def __init__(self, config: c.Config, data: pd.DataFrame, inner_model: im.InnerModel, outer_model: om.OuterModel,
-                 calculator: WeightsCalculatorFactory, iterations: int, num_processes: int):
-        weights = pd.DataFrame(columns=data.columns)
-        r_squared = pd.DataFrame(columns=inner_model.r_squared().index)
-        total_effects = pd.DataFrame(columns=inner_model.effects().index)
-        paths = pd.DataFrame(columns=inner_model.effects().index)
-        loadings = pd.DataFrame(columns=data.columns)
-
-        queue = Queue()
-        processes = []
-        for t in range(0, num_processes):
-            process = BootstrapProcess(queue, config, data, inner_model, calculator, iterations // num_processes)
-            process.start()
-            processes.append(process)
+                 calculator: WeightsCalculatorFactory, iterations: int, num_processes: int = None,
+                 shared_memory: bool = False, seed: int = None, chunk_size: int = 10, warm_start: bool = True,
+                 streaming: bool = False, tolerance: float = None, round_size: int = 100, checkpoint: str = None,
+                 bayesian: bool = False, executor: Union[str, Executor] = "processes",
+                 blas_threads: Union[int, str] = "auto", subsample: int = None, keep_draws: Union[bool, str] = False,
+                 htmt: pd.Series = None):
+        if bayesian and not config.metric():
+            raise Exception("The Bayesian bootstrap can only be performed on metric data.")
+        if subsample is not None and (bayesian or not 1 < subsample <= data.shape[0]):
+            raise Exception("The subsample size must be more than 1 and at most the number of observations, and "
+                            "cannot be combined with the Bayesian bootstrap.")
+        if isinstance(executor, str) and executor not in ("processes", "threads"):
+            raise Exception("Unknown bootstrap executor " + executor + ", expected processes, threads or an Executor.")
+        mvs = list(data.columns) + [mv for mv in outer_model.model().index if mv not in data.columns]
+        labels = {
+            "weights": mvs,
+            "r_squared": list(inner_model.r_squared().index),
+            "total_effects": list(inner_model.effects().index),
+            "paths": list(inner_model.effects().index),
+            "loadings": mvs,
+        }
+        if htmt is not None:
+            labels["htmt"] = list(htmt.index)
+        scale = 1
+        if subsample is not None:
+            # Estimates from m out of n observations are about sqrt(n / m) times as dispersed as those from all n, and
+            # the scores of the subsamples are standardised for m observations.
+            scale = np.sqrt(subsample / data.shape[0])
+            calculator = calculator.with_correction(np.sqrt(subsample / (subsample - 1)))
+        draws = _StreamingDraws(labels, scale) if streaming else _Draws(labels, scale)
+        accounting = _Accounting()
+        batched = _BATCHED and config.metric() and not config.hoc() and not data.isnull().values.any()
+        initial_weights = outer_model.model().loc[:, ["weight"]] if warm_start else None
+        round_size = iterations if tolerance is None else min(round_size, iterations)
+        originals = {
+            "weights": outer_model.model().loc[:, "weight"],
+            "r_squared": inner_model.r_squared(),
+            "total_effects": inner_model.effects().loc[:, "total"],
+            "paths": inner_model.effects().loc[:, "direct"],
+            "loadings": outer_model.model().loc[:, "loading"],
+        }
 
-        running = list(processes)
-        while running:
-            try:
-                while True:
-                    results = queue.get(False)
-                    weights = weights.append(results["weights"])
-                    r_squared = r_squared.append(results["r_squared"])
-                    total_effects = total_effects.append(results["total_effects"])
-                    paths = paths.append(results["paths"])
-                    loadings = loadings.append(results["loadings"])
-            except Empty:
-                pass
-            time.sleep(1)
-            if not queue.empty():
-                continue
-            running = [process for process in running if process.is_alive()]
-
-        self.__weights = _create_summary(weights, outer_model.model().loc[:, "weight"])
-        self.__r_squared = _create_summary(r_squared, inner_model.r_squared()).loc[inner_model.endogenous(), :]
-        self.__total_effects = _create_summary(total_effects, inner_model.effects().loc[:, "total"])
-        self.__paths = _create_summary(paths, inner_model.effects().loc[:, "direct"])
-        self.__loading = _create_summary(loadings, outer_model.model().loc[:, "loading"])
+        # The (round, size) of every chunk that could be drawn. Chunks are numbered, and seeded, consecutively across
+        # rounds and are merged in chunk order rather than completion order, which keeps the results reproducible.
+        plan = []
+        rounds = 0
+        while rounds * round_size < iterations:
+            size = min(round_size, iterations - rounds * round_size)
+            plan += [(rounds, min(chunk_size, size - start)) for start in range(0, size, chunk_size)]
+            rounds += 1
+        completed, history = [], []
+        fingerprint = None
+        if checkpoint is not None or isinstance(keep_draws, str):
+            fingerprint = _fingerprint(config, calculator, labels, [
+                outer_model.model().loc[:, ["weight", "loading"]].values, inner_model.r_squared().values,
+                inner_model.effects().loc[:, ["direct", "total"]].values, [] if htmt is None else htmt.values])
+        if checkpoint is not None:
+            checkpoint = _Checkpoint(checkpoint, labels, streaming, bayesian, subsample, fingerprint)
+            seed, completed, history = checkpoint.resume(seed, plan, draws, accounting)
+        store = None
+        if keep_draws is not False:
+            store = _DrawStore(labels, iterations, None if keep_draws is True else keep_draws, fingerprint)
+            store.open(len(accounting.iterations()), None if streaming else draws.state())
+        seeds = np.random.SeedSequence(seed)
+
+        num_processes, blas_threads = _executor_parallelism(executor, num_processes, blas_threads, data.shape[0],
+                                                            data.shape[1])
+        self.__parallelism = pd.Series({"workers": num_processes, "blas_threads": blas_threads}, name="parallelism")
+        shared_data = _SharedData(data) if shared_memory and executor == "processes" else None
+        pooled = []
+        backend = None
+        finished = False
+        limits = contextlib.ExitStack()
+        try:
+            limits.enter_context(_blas_limits(blas_threads))
+            if isinstance(executor, WorkerPool):
+                # Only handles are sent with each chunk: the workers load the dataset, and everything else the job
+                # needs, once and keep them for later chunks and later models.
+                pooled.append(executor.share(data, retain=True))
+                pooled.append(executor.share(_Job(config, pooled[0], inner_model, calculator, labels, batched,
+                                                  initial_weights, streaming, bayesian, subsample, blas_threads,
+                                                  store is not None)))
+                job = functools.partial(_run_shared, pooled[1])
+            else:
+                job = _Job(config, data if shared_data is None else shared_data, inner_model, calculator, labels,
+                           batched, initial_weights, streaming, bayesian, subsample, blas_threads, store is not None)
+            if executor == "processes":
+                backend = _ProcessBackend(job, min(num_processes, len(plan) - len(completed)))
+            elif executor == "threads":
+                backend = _ExecutorBackend(job, ThreadPoolExecutor(num_processes, "BootstrapThread"), True)
+            else:
+                backend = _ExecutorBackend(job, executor, False)
+
+            drawn = 0
+            stability = None
+            for number in range(0, rounds):
+                chunks = [index for index, chunk in enumerate(plan) if chunk[0] == number]
+                children = seeds.spawn(len(chunks))
+                for index, seed_sequence in zip(chunks, children):
+                    if index >= len(completed):
+                        backend.submit(index, plan[index][1], seed_sequence)
+                pending = {}
+                merged = max(chunks[0], len(completed))
+                while merged <= chunks[-1]:
+                    index, pending[index] = backend.collect()
+                    while merged in pending:
+                        results = pending.pop(merged)
+                        accounting.add(results)
+                        draws.add(results)
+                        if store is not None:
+                            store.add(results["draws"])
+                        completed.append(plan[merged])
+                        merged += 1
+                    if checkpoint is not None and checkpoint.due():
+                        checkpoint.save(completed, history, draws, accounting)
+                drawn += sum(plan[index][1] for index in chunks)
+                if tolerance is not None and drawn < iterations:
+                    # The stability of rounds restored from a checkpoint cannot always be recalculated, since streaming
+                    # keeps only the summaries of all the draws so far, so it is restored too.
+                    if number == len(history):
+                        history.append(_stability(draws, originals))
+                    previous, stability = stability, history[number]
+                if checkpoint is not None:
+                    checkpoint.save(completed, history, draws, accounting)
+                if tolerance is not None and drawn < iterations:
+                    if previous is not None and np.nanmax(np.abs(stability - previous)) < tolerance:
+                        break
+            finished = True
+        finally:
+            if backend is not None:
+                backend.close(finished)
+            for shared in pooled:
+                executor.release(shared)
+            limits.close()
+            if shared_data is not None:
+                shared_data.unlink()
+            if store is not None:
+                store.close()
+
+        self.__requested = iterations
+        self.__resamples = drawn
+        self.__weights = draws.summary("weights", originals["weights"])
+        self.__r_squared = draws.summary("r_squared", originals["r_squared"]).loc[inner_model.endogenous(), :]
+        self.__total_effects = draws.summary("total_effects", originals["total_effects"])
+        self.__paths = draws.summary("paths", originals["paths"])
+        self.__loading = draws.summary("loadings", originals["loadings"])
+        self.__htmt = None if htmt is None else draws.summary("htmt", htmt)
+        self.__iterations = pd.Series(accounting.iterations(), name="iterations")
+        self.__seconds = pd.Series(accounting.seconds(), name="seconds")
+        self.__failures = accounting.failures()
+        self.__workers = accounting.workers()
+        self.__draws = None if store is None else store.draws()
 
     def weights(self) -> pd.DataFrame:
         """Outer weights calculated from bootstrap validation."""
@@ -135,3 +1087,67 @@ class Bootstrap:
     def loading(self) -> pd.DataFrame:
         """Loadings of manifest variables calculated from bootstrap validation."""
         return self.__loading
+
+    def htmt(self) -> pd.DataFrame:
+        """Heterotrait-monotrait ratios (HTMT) for pairs of latent variables calculated from bootstrap validation.
+
+        Raises:
+            Exception: if the ratios were not bootstrapped
+        """
+        if self.__htmt is None:
+            raise Exception("To bootstrap the HTMT ratios, set the parameter bootstrap_htmt when calling Plspm")
+        return self.__htmt
+
+    def iterations(self) -> pd.Series:
+        """Number of iterations the algorithm took to converge on each successful resample."""
+        return self.__iterations
+
+    def resamples(self) -> int:
+        """Number of resamples drawn (for adaptive bootstrapping, the number drawn before the estimates settled)."""
+        return self.__resamples
+
+    def parallelism(self) -> pd.Series:
+        """Number of workers used (None if they could not be told from the executor passed in), and the number of
+        threads each was allowed to use for BLAS (None if not limited)."""
+        return self.__parallelism
+
+    def counts(self) -> pd.Series:
+        """Number of resamples requested, drawn, and that succeeded or failed.
+
+        Failed resamples (for example because the algorithm did not converge) are left out of all the bootstrap results.
+        """
+        succeeded = len(self.__iterations)
+        return pd.Series({"requested": self.__requested, "drawn": self.__resamples, "succeeded": succeeded,
+                          "failed": self.__resamples - succeeded}, name="resamples")
+
+    def failures(self) -> pd.Series:
+        """Number of failed resamples, by the type of exception that caused the failure."""
+        return self.__failures
+
+    def timing(self) -> pd.DataFrame:
+        """Distribution of the wall time (in seconds) and number of iterations taken by each successful resample.
+
+        When resamples are estimated together in batches, each resample is charged an equal share of the batch's time.
+        """
+        return pd.concat([self.__seconds, self.__iterations.astype(float)], axis=1).describe().T
+
+    def workers(self) -> pd.DataFrame:
+        """Number of chunks and resamples processed by each worker, the time it spent on them (in seconds), and its
+        throughput in resamples per second."""
+        return self.__workers
+
+    def draws(self, statistic: str) -> pd.DataFrame:
+        """Raw draws of a statistic (weights, r_squared, total_effects, paths, loadings or, if the ratios were
+        bootstrapped, htmt), as float32 values with a row per successful resample and a column per parameter, if they
+        were kept.
+
+        The DataFrame is backed by the arrays the draws were kept in (memory-mapped files if they were kept in a
+        directory) rather than a copy. For the m out of n bootstrap, the draws are those of the subsamples, before
+        rescaling.
+
+        Raises:
+            Exception: if the draws were not kept
+        """
+        if self.__draws is None:
+            raise Exception("To keep the bootstrap draws, set the parameter bootstrap_draws when calling Plspm")
+        return self.__draws[statistic]
@@ -143,6 +143,11 @@ class Config:
         mvs = { key: self.__mvs[key] for key in list(path) }
         return util.list_to_dummy(mvs)
 
+    def blocks(self, path: pd.DataFrame) -> util.Blocks:
+        """Internal method that returns the outer design matrix in block-sparse form (see :class:`.util.Blocks`), with
+        the MVs in the same order as :meth:`odm`."""
+        return util.Blocks({lv: self.__mvs[lv] for lv in list(path)})
+
     def mv_index(self, lv, mv):
         """Internal method that returns the index of a manifest variable for a given latent variable."""
         return self.__mvs[lv].index(mv)
@@ -284,11 +289,17 @@ class Config:
             data = data.drop(data.index[list(rows_to_delete)])
         return data
 
-    def treat(self, data: pd.DataFrame) -> pd.DataFrame:
+    def treat(self, data: pd.DataFrame, frequencies: np.ndarray = None, codes: dict = None) -> pd.DataFrame:
         """Internal method that treats the data (including scaling, normalizing, standardizing and rankifying, where appropriate)
 
         Args:
             data: The dataset to treat.
+            frequencies: Optionally, the number of times each observation occurs, for instance in a bootstrap resample.
+                The data is then treated as the dataset with each observation repeated that many times would be. Only
+                supported for metric data.
+            codes: Optionally, the integer codes of the ordinal and nominal MVs for each observation, as returned by
+                :meth:`categorical_codes` for a dataset the observations are drawn from, for instance by a bootstrap.
+                The MVs are then ranked from their codes rather than from their values.
 
         Returns:
             The treated dataset.
@@ -297,12 +308,21 @@ class Config:
             TypeError: if you have specified a scale for some but not all manifest variables. Specifying a scale for any MV tells Plspm that you are using nonmetric data, which means you must specify a scale for all MVs (or specify a default scale in the constructor).
         """
         if self.__metric:
-            metric_data = util.impute(data) if self.__missing else data
+            metric_data = util.impute(data, frequencies) if self.__missing else data
             if self.__scaled:
-                scale_values = metric_data.stack().std() * np.sqrt((metric_data.shape[0] - 1) / metric_data.shape[0])
-                return util.treat(metric_data, scale_values=scale_values)
+                if frequencies is None:
+                    observations = metric_data.shape[0]
+                    std = metric_data.stack().std()
+                else:
+                    observations = frequencies.sum()
+                    std = util.weighted_std(metric_data.stack().to_frame(),
+                                            np.repeat(frequencies, metric_data.shape[1])).iloc[0]
+                scale_values = std * np.sqrt((observations - 1) / observations)
+                return util.treat(metric_data, scale_values=scale_values, frequencies=frequencies)
             else:
-                return util.treat(metric_data, scale=False)
+                return util.treat(metric_data, scale=False, frequencies=frequencies)
+        elif frequencies is not None:
+            raise TypeError("Frequencies can only be applied to metric data.")
         else:
             if None in self.__mv_scales.values():
                 raise TypeError("If you supply a scale for any MV, you must either supply a scale for all of them or specify a default scale.")
@@ -314,6 +334,109 @@ class Config:
             data = util.treat(data) / np.sqrt((data.shape[0] - 1) / data.shape[0])
             for mv in self.__mv_scales:
                 if self.__mv_scales[mv] in [Scale.ORD, Scale.NOM]:
-                    data.loc[:, mv] = util.rank(data.loc[:, mv])
-                    self.__dummies[mv] = util.dummy(data.loc[:, mv]).values
+                    if codes is None:
+                        data.loc[:, mv] = util.rank(data.loc[:, mv])
+                        self.__dummies[mv] = util.dummy(data.loc[:, mv]).values
+                    else:
+                        data.loc[:, mv], self.__dummies[mv] = util.rank_codes(*codes[mv])
             return data
+
+    def categorical_codes(self, data: pd.DataFrame) -> dict:
+        """Internal method that encodes the ordinal and nominal MVs of a dataset once, so that datasets drawn from it can be
+        treated without ranking their values again (see :meth:`treat`).
+
+        Returns:
+            A dictionary from each ordinal or nominal MV to a tuple of the code of each observation (the position of its
+            value among the sorted distinct values, or -1 if it is missing) and the number of distinct values.
+        """
+        codes = {}
+        for mv in self.__mv_scales:
+            if self.__mv_scales[mv] in [Scale.ORD, Scale.NOM]:
+                values = data.loc[:, mv].values.astype(np.float64)
+                present = ~np.isnan(values)
+                categories, inverse = np.unique(values[present], return_inverse=True)
+                mv_codes = np.full(values.shape[0], -1)
+                mv_codes[present] = inverse
+                codes[mv] = (mv_codes, categories.shape[0])
+        return codes
+
+    def metric_values(self, data: pd.DataFrame) -> tuple:
+        """Internal method that returns the values of metric data and their means, from which :meth:`drawn_moments`
+        computes the moments of resamples of the data. The values are not copied if they are already floating point, so
+        a dataset in shared memory stays there."""
+        if not self.__metric:
+            raise TypeError("Moments can only be computed for metric data.")
+        values = np.asarray(data.values, dtype=np.float64)
+        return values, values.mean(axis=0)
+
+    def drawn_moments(self, values: np.ndarray, means: np.ndarray, draws: list) -> np.ndarray:
+        """Internal method that computes the covariance matrices of treated resamples of metric data, without
+        materialising the resamples. Only the observations drawn in a resample contribute to it, so its cost grows with
+        the number of distinct observations drawn rather than with the size of the dataset.
+
+        Args:
+            values: The values of the dataset, as returned by :meth:`metric_values`.
+            means: The means of the dataset, as returned by :meth:`metric_values`.
+            draws: A list with a pair of arrays for each resample: the positions of the observations drawn, and the
+                number of times (or weight with which) each was drawn.
+
+        Returns:
+            An array containing the covariance matrix (with denominator n) of each resample after it has been treated as
+            :meth:`treat` would treat it, with rows and columns in the same order as the columns of the dataset.
+        """
+        moments = np.empty((len(draws), values.shape[1], values.shape[1]), dtype=np.float64)
+        for i, (drawn, frequency) in enumerate(draws):
+            # Centering on the full sample first avoids losing precision when the resample means are subtracted. Only
+            # the observations drawn are centered, so that the dataset is not copied.
+            drawn_values = values[drawn] - means
+            moments[i] = self.__moments(drawn_values.T.dot(drawn_values * frequency[:, np.newaxis]),
+                                        frequency.dot(drawn_values), frequency.sum(), means)
+        return moments
+
+    def cross_products(self, data: pd.DataFrame) -> tuple:
+        """Internal method that computes what :meth:`downdated_moments` needs to know about the whole of a dataset: its
+        values centered on their means, and its totals (the number of observations, the means, the sums of the centered
+        values and their cross-products). The totals do not grow with the number of observations, so they are cheap to
+        send to other processes, along with the centered values of the observations left out.
+
+        Args:
+            data: The dataset. Must be metric and have no missing values.
+        """
+        values, means = self.metric_values(data)
+        values = values - means
+        # The sums of the centered values are zero up to rounding error.
+        return values, (values.shape[0], means, values.sum(axis=0), values.T.dot(values))
+
+    def downdated_moments(self, totals: tuple, groups: list) -> np.ndarray:
+        """Internal method that computes the covariance matrices of treated metric data with each group of observations
+        left out in turn, as :meth:`drawn_moments` would for the observations left in, each drawn once.
+
+        The cross-products of the whole dataset are only computed once (by :meth:`cross_products`), and those of each
+        group are subtracted from them (a rank k downdate for a group of k observations), so the cost per group grows
+        with its size rather than with the size of the dataset.
+
+        Args:
+            totals: The totals :meth:`cross_products` returned for the dataset.
+            groups: A list of arrays, each containing the centered values (as returned by :meth:`cross_products`) of
+                the observations to leave out, with a row per observation.
+        """
+        observations, means, sums, cross = totals
+        moments = np.empty((len(groups), cross.shape[0], cross.shape[0]), dtype=np.float64)
+        for i, left_out in enumerate(groups):
+            moments[i] = self.__moments(cross - left_out.T.dot(left_out), sums - left_out.sum(axis=0),
+                                        observations - left_out.shape[0], means)
+        return moments
+
+    def __moments(self, cross: np.ndarray, sums: np.ndarray, observations: float, means: np.ndarray) -> np.ndarray:
+        # The treated covariance of a resample from its cross-products and sums, which are of values centered on the
+        # full sample's means.
+        resample_means = sums / observations
+        moments = cross / observations - np.outer(resample_means, resample_means)
+        if self.__scaled:
+            # Matches the scaling applied by treat, which uses the standard deviation of all the values in the
+            # resample taken together.
+            column_means = resample_means + means
+            size = observations * cross.shape[0]
+            variance = observations * (np.trace(moments) + np.power(column_means - column_means.mean(), 2).sum()) / (size - 1)
+            moments = moments / (variance * (observations - 1) / observations)
+        return moments
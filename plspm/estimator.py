@@ -15,7 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import plspm.config as c, pandas as pd, numpy.testing as npt
+import plspm.config as c, pandas as pd, numpy as np, numpy.testing as npt
 from plspm.weights import WeightsCalculatorFactory
 from plspm.scale import Scale
 from typing import Tuple
@@ -26,21 +26,27 @@ class Estimator:
     def __init__(self, config: c.Config):
         self.__hoc_path_first_stage = self.hoc_path_first_stage(config)
 
-    def estimate(self, calculator: WeightsCalculatorFactory, data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    def estimate(self, calculator: WeightsCalculatorFactory, data: pd.DataFrame, initial_weights: pd.DataFrame = None,
+                 frequencies: np.ndarray = None, codes: dict = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
         # Make sure we are threadsafe
         calculator = calculator.clone()
         config = calculator.config()
-        treated_data = config.treat(data)
+        # With frequencies (metric data only), each observation counts as if it were repeated that many times, so
+        # a bootstrap resample can be estimated without copying the rows drawn.
+        # With codes (nonmetric data only), ordinal and nominal MVs are ranked from codes computed once for the dataset
+        # the observations were drawn from.
+        treated_data = config.treat(data, frequencies, codes)
 
         hocs = config.hoc()
-        if hocs is not None:
-            path = self.__hoc_path_first_stage
+        path = self.__hoc_path_first_stage if hocs else config.path()
 
-        final_data, scores, weights = calculator.calculate(treated_data, path)
+        final_data, scores, weights = calculator.calculate(treated_data, path, initial_weights, frequencies)
+        iterations = calculator.iterations()
+        extrapolations = calculator.extrapolations()
 
         # If we have higher order constructs, re-estimate the model using the scores of the constituent LVs of the HOC
         # generated by the first round of estimation as the HOC's MVs.
-        if hocs is not None:
+        if hocs:
             scale = None if config.metric() else Scale.NUM
             for hoc in hocs:
                 new_mvs = []
@@ -49,14 +55,26 @@ class Estimator:
                     treated_data[mv_new] = scores[lv]
                     new_mvs.append(c.MV(mv_new, scale))
                 config.add_lv(hoc, config.mode(hoc), *new_mvs)
-            final_data, scores, weights = calculator.calculate(treated_data, config.path())
+            final_data, scores, weights = calculator.calculate(treated_data, config.path(), initial_weights, frequencies)
+            iterations += calculator.iterations()
+            extrapolations += calculator.extrapolations()
         self.__config = config
+        self.__iterations = iterations
+        self.__extrapolations = extrapolations
 
         return final_data, scores, weights
 
     def config(self):
         return self.__config
 
+    def iterations(self) -> int:
+        """Internal method that returns the number of iterations the last estimation took."""
+        return self.__iterations
+
+    def extrapolations(self) -> int:
+        """Internal method that returns the number of accelerated steps the last estimation took."""
+        return self.__extrapolations
+
     def hoc_path_first_stage(self, config: c.Config) -> pd.DataFrame:
         # For first pass, for HOCs we'll create paths from each and for each exogenous LV to the HOC's constituent LVs,
         # and from each consituent LV to the endogenous LVs.
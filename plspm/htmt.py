@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+#
+# Copyright (C) 2019 Google Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pandas as pd, numpy as np, plspm.util as util
+
+
+class Htmt:
+    """Internal class that computes the heterotrait-monotrait ratios of correlations (HTMT) used to assess discriminant
+    validity. Use the method :meth:`~.plspm.Plspm.htmt` defined on :class:`~.plspm.Plspm` to retrieve the results.
+
+    The ratio for a pair of latent variables is the mean absolute correlation between the MVs of one and the MVs of the
+    other, divided by the geometric mean of the mean absolute correlation between different MVs of each. It is missing
+    for latent variables with a single MV."""
+    def __init__(self, odm: util.Blocks):
+        self.__odm = odm
+        self.__lvs = odm.lvs()
+        self.__mvs = odm.mvs()
+        self.__sizes = np.array([rows.stop - rows.start for rows in odm.slices()])
+        # The pairs of latent variables below the diagonal, row by row.
+        self.__rows, self.__columns = np.tril_indices(len(self.__lvs), -1)
+
+    def labels(self) -> list:
+        """Internal method that returns the label of each pair of latent variables, in the order of :meth:`calculate`."""
+        return [self.__lvs[row] + " - " + self.__lvs[column] for row, column in zip(self.__rows, self.__columns)]
+
+    def calculate(self, cor: np.ndarray) -> np.ndarray:
+        """Internal method that calculates the ratios for a stack of MV correlation matrices, with rows and columns in
+        the order of the outer design matrix, returning a row of ratios per matrix."""
+        cor = np.abs(cor)
+        sizes, rows, columns = self.__sizes, self.__rows, self.__columns
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # The sums of the correlations between the MVs of each pair of latent variables, block by block.
+            sums = self.__odm.sum(self.__odm.sum(cor, axis=-1), axis=-2)
+            # The mean of the correlations off the diagonal, which has a correlation of one per MV.
+            within = np.diagonal(sums, axis1=-2, axis2=-1) \
+                - self.__odm.sum(np.diagonal(cor, axis1=-2, axis2=-1), axis=-1)
+            monotrait = within / (sizes * (sizes - 1))
+            heterotrait = sums[:, rows, columns] / (sizes[rows] * sizes[columns])
+            return heterotrait / np.sqrt(monotrait[:, rows] * monotrait[:, columns])
+
+    def summary(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Internal method that returns the ratios for a dataset as a matrix, with the ratio for each pair of latent
+        variables below the diagonal."""
+        ratios = np.full((len(self.__lvs), len(self.__lvs)), np.nan)
+        ratios[self.__rows, self.__columns] = self.calculate(data.loc[:, self.__mvs].corr().values[np.newaxis, :, :])[0]
+        return pd.DataFrame(ratios, index=self.__lvs, columns=self.__lvs)
+
+    def values(self, data: pd.DataFrame) -> pd.Series:
+        """Internal method that returns the ratios for a dataset, indexed by :meth:`labels`."""
+        return pd.Series(self.calculate(data.loc[:, self.__mvs].corr().values[np.newaxis, :, :])[0],
+                         index=self.labels(), name="htmt")
@@ -0,0 +1,203 @@
+#!/usr/bin/python3
+#
+# Copyright (C) 2019 Google Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import plspm.config as c, pandas as pd, numpy as np, plspm.inner_model as im, plspm.outer_model as om, time
+import collections, contextlib, os
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from plspm.bootstrap import _BatchedResampler, _blas_limits, _executor_parallelism
+from plspm.weights import WeightsCalculatorFactory
+from typing import Union
+
+
+def _jackknife_summary(draws: np.ndarray, index: list, original) -> pd.DataFrame:
+    # Draws has a row per group left out. Missing values (effects that are not estimated) are ignored.
+    summary = pd.DataFrame(0, index=index, columns=["original", "mean", "std.error", "bias", "acceleration", "t stat."])
+    summary.loc[:, "original"] = original
+    groups = np.isfinite(draws).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nanmean(draws, axis=0)
+        deviations = mean - draws
+        squares = np.nansum(np.power(deviations, 2), axis=0)
+        summary.loc[:, "mean"] = mean
+        summary.loc[:, "std.error"] = np.sqrt((groups - 1) / groups * squares)
+        summary.loc[:, "bias"] = (groups - 1) * (mean - summary.loc[:, "original"].values)
+        summary.loc[:, "acceleration"] = np.nansum(np.power(deviations, 3), axis=0) / (6 * np.power(squares, 1.5))
+    summary.loc[:, "t stat."] = summary.loc[:, "original"] / summary.loc[:, "std.error"]
+    return summary
+
+
+class _JackknifeJob:
+    """Internal class that holds everything needed to estimate the model with each of a chunk of groups of observations
+    left out. It is callable with the index of the chunk and the centered values of its groups (see
+    :meth:`.Config.cross_products`), which must all be of the same size, so that it can be submitted to any
+    :class:`concurrent.futures.Executor`. It only holds the totals of the dataset, whose size does not depend on the
+    number of observations, so the dataset itself is never sent to the workers: each chunk only carries the observations
+    it leaves out."""
+    def __init__(self, config: c.Config, data: pd.DataFrame, totals: tuple, inner_model: im.InnerModel,
+                 calculator: WeightsCalculatorFactory, labels: dict, initial_weights: pd.DataFrame,
+                 blas_threads: int = None):
+        self.__parent = os.getpid()
+        self.__blas_threads = blas_threads
+        self.__config = config
+        # Only the columns are needed to estimate a resample from its moments.
+        self.__data = data.iloc[:0, :]
+        self.__totals = totals
+        self.__inner_model = inner_model
+        self.__calculator = calculator
+        self.__labels = labels
+        self.__initial_weights = initial_weights
+
+    def __call__(self, index: int, groups: list) -> tuple:
+        start = time.perf_counter()
+        # The scores of each leave-out sample are standardised for the observations that are left in.
+        observations = self.__totals[0] - groups[0].shape[0]
+        calculator = self.__calculator.with_correction(np.sqrt(observations / (observations - 1)))
+        # As for the bootstrap, BLAS threads are limited by the jackknife itself in its own process.
+        with _blas_limits(self.__blas_threads) if os.getpid() != self.__parent else contextlib.nullcontext():
+            resampler = _BatchedResampler(self.__config, self.__data, self.__inner_model, calculator, self.__labels,
+                                          self.__initial_weights)
+            return index, resampler.estimate(self.__config.downdated_moments(self.__totals, groups), start)
+
+
+class Jackknife:
+    """Performs jackknife validation to estimate the standard errors and bias of the model's estimates.
+
+    Setting ``jackknife=True`` when constructing :class:`.Plspm` will perform jackknife validation. Calling
+    :meth:`~.Plspm.jackknife` on :class:`.Plspm` will return an instance of this class, from which the results can be
+    retrieved by calling the methods listed below, as for :class:`.bootstrap.Bootstrap`.
+
+    The model is estimated once with each observation left out (leave-one-out) or, with a ``group_size`` d above one,
+    with each of n // d random groups of about d observations left out (delete-d), where ``seed`` seeds the assignment
+    of observations to groups. Only metric data without missing values or higher order constructs is supported.
+
+    Each estimation only needs the covariance matrix of the data that is left in, which is obtained by subtracting the
+    cross-products of the group left out from those of the whole dataset, computed once. Estimation starts from the
+    weights estimated on the full dataset, which the leave-out estimates are close to, and chunks of ``chunk_size``
+    groups are estimated together by the batched engine, spread across ``num_processes`` workers: worker processes (the
+    default, ``"processes"``), threads of this process (``"threads"``), or any :class:`concurrent.futures.Executor`. Only
+    the totals of the dataset and the observations each chunk leaves out are sent to the workers. As for
+    :class:`.bootstrap.Bootstrap`, ``blas_threads`` limits the number of BLAS threads per worker.
+
+    The summaries report, for each estimate, the mean of the leave-out estimates, the jackknife standard error and bias,
+    and the acceleration, which can be used for bias corrected and accelerated bootstrap intervals.
+    """
+    def __init__(self, config: c.Config, data: pd.DataFrame, inner_model: im.InnerModel, outer_model: om.OuterModel,
+                 calculator: WeightsCalculatorFactory, group_size: int = 1, num_processes: int = None,
+                 executor: Union[str, Executor] = "processes", seed: int = None, chunk_size: int = 100,
+                 blas_threads: Union[int, str] = "auto"):
+        if not config.metric() or config.hoc() or data.isnull().values.any():
+            raise Exception("The jackknife can only be performed on metric data without missing values or higher "
+                            "order constructs.")
+        if not 0 < group_size <= data.shape[0] // 2:
+            raise Exception("The jackknife group size must be at least 1 and at most half the number of observations.")
+        if isinstance(executor, str) and executor not in ("processes", "threads"):
+            raise Exception("Unknown jackknife executor " + executor + ", expected processes, threads or an Executor.")
+        labels = {
+            "weights": list(data.columns),
+            "r_squared": list(inner_model.r_squared().index),
+            "total_effects": list(inner_model.effects().index),
+            "paths": list(inner_model.effects().index),
+            "loadings": list(data.columns),
+        }
+        observations = data.shape[0]
+        if group_size == 1:
+            groups = [np.array([i]) for i in range(observations)]
+        else:
+            groups = np.array_split(np.random.default_rng(seed).permutation(observations), observations // group_size)
+        # Groups of each size are estimated separately, since the correction applied to the scores depends on the
+        # number of observations left in.
+        chunks = []
+        for size in sorted(set(len(group) for group in groups)):
+            sized = [group for group in groups if len(group) == size]
+            chunks += [sized[start:start + chunk_size] for start in range(0, len(sized), chunk_size)]
+
+        values, totals = config.cross_products(data)
+        num_processes, blas_threads = _executor_parallelism(executor, num_processes, blas_threads, data.shape[0],
+                                                            data.shape[1])
+        job = _JackknifeJob(config, data, totals, inner_model, calculator, labels,
+                            outer_model.model().loc[:, ["weight"]], blas_threads)
+        if executor == "threads":
+            executor, owned = ThreadPoolExecutor(num_processes, "JackknifeThread"), True
+        elif executor == "processes":
+            executor, owned = ProcessPoolExecutor(num_processes), True
+        else:
+            owned = False
+        futures = []
+        try:
+            with _blas_limits(blas_threads):
+                futures = [executor.submit(job, index, [values[group] for group in chunk])
+                           for index, chunk in enumerate(chunks)]
+                # Merged in chunk order, so that the results do not depend on the order in which chunks complete.
+                results = [future.result()[1] for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+            if owned:
+                executor.shutdown(wait=True)
+
+        draws = {statistic: np.concatenate([np.empty((0, len(labels[statistic])))]
+                                           + [result[statistic] for result in results], axis=0)
+                 for statistic in labels}
+        failures = collections.Counter()
+        for result in results:
+            failures.update(result["failures"])
+        self.__groups = len(groups)
+        self.__weights = _jackknife_summary(draws["weights"], labels["weights"], outer_model.model().loc[:, "weight"])
+        self.__r_squared = _jackknife_summary(draws["r_squared"], labels["r_squared"],
+                                              inner_model.r_squared()).loc[inner_model.endogenous(), :]
+        self.__total_effects = _jackknife_summary(draws["total_effects"], labels["total_effects"],
+                                                  inner_model.effects().loc[:, "total"])
+        self.__paths = _jackknife_summary(draws["paths"], labels["paths"], inner_model.effects().loc[:, "direct"])
+        self.__loading = _jackknife_summary(draws["loadings"], labels["loadings"],
+                                            outer_model.model().loc[:, "loading"])
+        self.__iterations = pd.Series(np.concatenate([np.empty(0, dtype=int)]
+                                                     + [result["iterations"] for result in results]),
+                                      name="iterations")
+        self.__failures = pd.Series(dict(failures), dtype=int, name="failures").sort_index()
+
+    def weights(self) -> pd.DataFrame:
+        """Outer weights calculated from jackknife validation."""
+        return self.__weights
+
+    def r_squared(self) -> pd.DataFrame:
+        """R squared for latent variables calculated from jackknife validation."""
+        return self.__r_squared
+
+    def total_effects(self) -> pd.DataFrame:
+        """Total effects for paths calculated from jackknife validation."""
+        return self.__total_effects
+
+    def paths(self) -> pd.DataFrame:
+        """Direct effects for paths calculated from jackknife validation."""
+        return self.__paths[self.__paths["mean"] != 0]
+
+    def loading(self) -> pd.DataFrame:
+        """Loadings of manifest variables calculated from jackknife validation."""
+        return self.__loading
+
+    def iterations(self) -> pd.Series:
+        """Number of iterations the algorithm took to converge with each group left out, for the groups that succeeded."""
+        return self.__iterations
+
+    def groups(self) -> int:
+        """Number of groups of observations left out in turn."""
+        return self.__groups
+
+    def failures(self) -> pd.Series:
+        """Number of groups for which the estimation failed, by the type of exception that caused the failure. These
+        groups are left out of all the jackknife results."""
+        return self.__failures
@@ -25,11 +25,21 @@ class _ModeA(util.Value):
     def __init__(self):
         super().__init__("A")
 
-    def outer_weights_metric(self, data: pd.DataFrame, Z: pd.DataFrame, lv: str, mvs: list) -> pd.DataFrame:
-        return (1 / data.shape[0]) * Z.loc[:, [lv]].T.dot(data.loc[:, mvs]).T
+    def solver(self, block: np.ndarray, frequencies: np.ndarray = None):
+        # Mode A weights are covariances, which need nothing to be precomputed.
+        return None
+
+    def batched_solver(self, moments: np.ndarray, mvs: np.ndarray):
+        return None
+
+    def outer_weights_metric(self, block: np.ndarray, z: np.ndarray, frequencies: np.ndarray = None,
+                             solver: np.ndarray = None) -> np.ndarray:
+        if frequencies is not None:
+            return np.dot(block.T, z * frequencies) / frequencies.sum()
+        return np.dot(block.T, z) / block.shape[0]
 
     def outer_weights_nonmetric(self, mv_grouped_by_lv: list, mv_grouped_by_lv_missing: list, Z: np.ndarray, lv: str,
-                                correction: float) -> Tuple[np.ndarray, np.ndarray]:
+                                correction: float, solver: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
         if lv in mv_grouped_by_lv_missing:
             weights = np.nansum(mv_grouped_by_lv[lv] * Z[:, np.newaxis], axis=0)
             weights = weights / np.sum(np.power(mv_grouped_by_lv_missing[lv] * Z[:, np.newaxis], 2), axis=0)
@@ -41,25 +51,60 @@ class _ModeA(util.Value):
         Y = util.treat_numpy(Y) * correction
         return weights, Y
 
+    def outer_weights_batched(self, moments: np.ndarray, cross: np.ndarray, mvs: np.ndarray, lv: int,
+                              solver: np.ndarray = None) -> np.ndarray:
+        return cross[:, mvs, lv]
+
 
 class _ModeB(util.Value):
 
     def __init__(self):
         super().__init__("B")
 
-    def outer_weights_metric(self, data: pd.DataFrame, Z: pd.DataFrame, lv: str, mvs: list) -> pd.DataFrame:
-        w, _, _, _ = linalg.lstsq(data.loc[:, mvs], Z.loc[:, [lv]])
-        return pd.DataFrame(w, columns=[lv], index=mvs)
+    def solver(self, block: np.ndarray, frequencies: np.ndarray = None) -> np.ndarray:
+        """Internal method that returns the matrix that gives the weights of a block, when multiplied by the inner
+        estimate of its scores: the pseudo-inverse of the block, whose regression on the inner estimate gives the minimum
+        norm least squares solution, as lstsq does, even if its MVs are collinear. The block only changes between
+        estimations, so this replaces a least squares solve in every iteration with a product."""
+        # Singular values below this fraction of the largest are treated as zero, as by numpy's lstsq.
+        cutoff = max(block.shape) * np.finfo(np.float64).eps
+        if frequencies is not None:
+            # Weighted least squares: scaling each row by the square root of its frequency gives the same normal
+            # equations as repeating it.
+            root = np.sqrt(frequencies)
+            return np.linalg.pinv(block * root[:, np.newaxis], rcond=cutoff) * root
+        return np.linalg.pinv(block, rcond=cutoff)
+
+    def batched_solver(self, moments: np.ndarray, mvs: np.ndarray) -> np.ndarray:
+        """Internal method that returns the pseudo-inverse of the moment matrix of a block in each resample, as used by
+        :meth:`outer_weights_batched`."""
+        return np.linalg.pinv(moments[:, mvs, :][:, :, mvs])
+
+    def outer_weights_metric(self, block: np.ndarray, z: np.ndarray, frequencies: np.ndarray = None,
+                             solver: np.ndarray = None) -> np.ndarray:
+        if solver is None:
+            solver = self.solver(block, frequencies)
+        return np.dot(solver, z)
 
     def outer_weights_nonmetric(self, mv_grouped_by_lv: list, mv_grouped_by_lv_missing: list, Z: pd.DataFrame, lv: str,
-                                correction: float) -> Tuple[np.ndarray, np.ndarray]:
+                                correction: float, solver: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
         if lv in mv_grouped_by_lv_missing:
             raise Exception("Missing nonmetric data is not supported in mode B. LV with missing data: " + lv)
-        weights, _, _, _ = linalg.lstsq(mv_grouped_by_lv[lv], Z)
+        if solver is None:
+            weights, _, _, _ = linalg.lstsq(mv_grouped_by_lv[lv], Z)
+        else:
+            weights = np.dot(solver, Z)
         Y = np.dot(mv_grouped_by_lv[lv], weights)
         Y = util.treat_numpy(Y) * correction
         return weights, Y
 
+    def outer_weights_batched(self, moments: np.ndarray, cross: np.ndarray, mvs: np.ndarray, lv: int,
+                              solver: np.ndarray = None) -> np.ndarray:
+        # The minimum norm least squares solution, as returned by lstsq, expressed in terms of the moment matrices.
+        if solver is None:
+            solver = self.batched_solver(moments, mvs)
+        return np.matmul(solver, cross[:, mvs, lv, np.newaxis])[:, :, 0]
+
 
 class Mode(Enum):
     """
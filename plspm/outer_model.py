@@ -15,20 +15,24 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import pandas as pd, numpy as np
+import pandas as pd, numpy as np, plspm.util as util
 
 
 class OuterModel:
     """Internal class that computes characteristics of the outer model.  Use the methods :meth:`~.plspm.Plspm.outer_model` and :meth:`~.plspm.Plspm.crossloadings` defined on :class:`~.plspm.Plspm` to retrieve the outer model characteristics."""
 
-    def __init__(self, data: pd.DataFrame, scores: pd.DataFrame, weights: pd.DataFrame, odm: pd.DataFrame,
+    def __init__(self, data: pd.DataFrame, scores: pd.DataFrame, weights: pd.DataFrame, odm: util.Blocks,
                  r_squared: pd.Series):
         self.__crossloadings = scores.apply(lambda s: data.corrwith(s))
-        loading = (self.__crossloadings * odm).sum(axis=1).to_frame(name="loading")
+        mvs, lv_index = odm.mvs(), odm.lv_index()
+        # Each MV's loading is its crossloading with its own LV. Missing crossloadings and R squared count as zero, as
+        # they would in a sum over the outer design matrix.
+        crossloadings = self.__crossloadings.loc[mvs, odm.lvs()].values
+        loading = pd.DataFrame(crossloadings[np.arange(len(mvs)), lv_index], index=mvs, columns=["loading"]).fillna(0)
         communality = loading.apply(lambda s: pow(s, 2))
         communality.columns = ["communality"]
-        r_squared_aux = odm.dot(pd.DataFrame(np.diag(r_squared), index=r_squared.index, columns=r_squared.index)).sum(
-            axis=1).to_frame(name="communality")
+        r_squared_aux = pd.DataFrame(r_squared.loc[odm.lvs()].values[lv_index], index=mvs,
+                                     columns=["communality"]).fillna(0)
         redundancy = communality * r_squared_aux
         redundancy.columns = ["redundancy"]
         self.__outer_model = pd.concat([weights, loading, communality, redundancy], axis=1, sort=True)
@@ -18,9 +18,14 @@
 import plspm.inner_summary as pis, plspm.config as c
 import pandas as pd, numpy as np, plspm.weights as w, plspm.outer_model as om, plspm.inner_model as im
 from plspm.scheme import Scheme
+from plspm.acceleration import Acceleration
 from plspm.unidimensionality import Unidimensionality
 from plspm.bootstrap import Bootstrap
+from plspm.jackknife import Jackknife
+from plspm.htmt import Htmt
 from plspm.estimator import Estimator
+from concurrent.futures import Executor
+from typing import Union
 
 
 class Plspm:
@@ -34,7 +39,12 @@ class Plspm:
 
     def __init__(self, data: pd.DataFrame, config: c.Config, scheme: Scheme = Scheme.CENTROID,
                  iterations: int = 100, tolerance: float = 0.000001, bootstrap: bool = False,
-                 bootstrap_iterations: int = 100, processes: int = 2):
+                 bootstrap_iterations: int = 100, processes: int = None, shared_memory: bool = False, seed: int = None,
+                 warm_start: bool = True, streaming: bool = False, bootstrap_tolerance: float = None,
+                 bootstrap_round_size: int = 100, bootstrap_checkpoint: str = None, bayesian_bootstrap: bool = False,
+                 executor: Union[str, Executor] = "processes", blas_threads: Union[int, str] = "auto",
+                 bootstrap_subsample: int = None, bootstrap_draws: Union[bool, str] = False, jackknife: bool = False,
+                 jackknife_group_size: int = 1, acceleration: Acceleration = None, bootstrap_htmt: bool = False):
         """Creates an instance of the path model calculator.
 
         Args:
@@ -44,8 +54,24 @@ class Plspm:
             iterations: The maximum number of iterations to try to get the algorithm to converge (default and minimum 100).
             tolerance: The tolerance criterion for iterations (default 0.000001, must be >0)
             bootstrap: Whether to perform bootstrap validation (default is not to perform validation)
-            bootstrap_iterations: The number of bootstrap samples to use if bootstrap validation is enabled (default and minimum 100)
-            processes: The number of processes to use while bootstrapping (bootstrap_iterations must be a multiple of processes)
+            bootstrap_iterations: The number of bootstrap samples to use if bootstrap validation is enabled (default and minimum 100). If bootstrap_tolerance is set, this is the maximum number of bootstrap samples to use.
+            processes: The number of processes (or threads) to use while bootstrapping (default is the number of cores, or fewer if the model is large enough for each to use several BLAS threads, see blas_threads)
+            shared_memory: Whether to place the dataset in a shared memory block that all bootstrap processes read from, rather than giving each process its own copy (default is not to use shared memory)
+            seed: The seed for the random number generator used while bootstrapping. Results for a given seed are the same whatever the number of processes (default is to seed from fresh entropy)
+            warm_start: Whether to start the estimation of each bootstrap resample from the weights estimated on the full dataset rather than from unit weights (default is to start from the full dataset's weights)
+            streaming: Whether to summarise bootstrap draws as they are produced instead of keeping them all, so that memory use does not grow with bootstrap_iterations. Percentiles are then approximate for large numbers of resamples (default is to keep all draws)
+            bootstrap_tolerance: If set, bootstrap samples are drawn in rounds until the standard errors and percentile bounds of the paths, weights and loadings change by less than this amount between rounds, or until bootstrap_iterations samples have been drawn (default is to always draw bootstrap_iterations samples)
+            bootstrap_round_size: The number of bootstrap samples to draw in each round if bootstrap_tolerance is set (default 100)
+            bootstrap_checkpoint: Path of an npz file to save the progress of bootstrapping to, and to resume from if it already exists. Resuming requires the same seed (unless none was given), model and bootstrap settings (default is not to save progress)
+            bayesian_bootstrap: Whether to perform a Bayesian bootstrap, which weights the observations with weights drawn from a flat Dirichlet distribution instead of resampling them. Only supported for metric data (default is the ordinary bootstrap)
+            executor: How to run bootstrap resamples in parallel: "processes" to start dedicated worker processes (the default), "threads" to use a pool of threads in this process, or any :class:`concurrent.futures.Executor`, such as a thread or process pool, which is left running afterwards. Pass the same :class:`.pool.WorkerPool` to many instances to reuse warm worker processes across models
+            blas_threads: The number of threads each bootstrap worker may use for linear algebra (BLAS). One is usually fastest when there are several workers. "auto" (the default) picks the split between workers and threads from the number of cores and the size of the model, so that they do not oversubscribe the cores. None does not limit threads
+            bootstrap_subsample: If set, each bootstrap sample draws this many observations rather than as many as there are in the dataset (the m out of n bootstrap), and the standard errors and percentiles are rescaled to the size of the dataset. Makes bootstrapping much cheaper for large datasets (default is to draw as many observations as there are in the dataset)
+            bootstrap_draws: Whether to keep the raw bootstrap draws, which :meth:`.bootstrap.Bootstrap.draws` returns. True keeps them in memory; the path of a directory writes them to memory-mapped .npy files in it, which :func:`.bootstrap.load_draws` can reopen later (default is not to keep them)
+            jackknife: Whether to perform jackknife validation, estimating the model with each observation (or group of observations) left out in turn. Uses processes, executor, blas_threads and seed as bootstrapping does. Only supported for metric data without missing values or higher order constructs (default is not to perform validation)
+            jackknife_group_size: The number of observations to leave out at a time if jackknife validation is enabled. Above one, observations are randomly assigned to groups of about this size (default 1, leave-one-out)
+            acceleration: The extrapolation to use to speed up the convergence of the outer weights, :attr:`.Acceleration.SQUAREM` or :attr:`.Acceleration.ANDERSON` (see documentation for :mod:`.acceleration`). Bootstrap resamples that are estimated one at a time are accelerated too (default is not to accelerate)
+            bootstrap_htmt: Whether to also bootstrap the heterotrait-monotrait ratios (see :meth:`htmt`), if bootstrap validation is enabled, to get intervals for them from :meth:`.bootstrap.Bootstrap.htmt` (default is not to bootstrap them)
 
         Raises:
             Exception: if the algorithm cannot converge, or if the requested configuration could not be calculated
@@ -55,31 +81,49 @@ class Plspm:
             iterations = 100
         assert tolerance > 0
         assert scheme in Scheme
+        assert acceleration is None or acceleration in Acceleration
         if bootstrap_iterations < 10:
             bootstrap_iterations = 100
-        assert processes > 0
-        assert bootstrap_iterations % processes == 0
+        assert processes is None or processes > 0
+        assert blas_threads is None or blas_threads == "auto" or blas_threads > 0
+        assert bootstrap_tolerance is None or bootstrap_tolerance > 0
+        assert bootstrap_round_size > 0
 
         estimator = Estimator(config)
         filtered_data = config.filter(data)
         correction = np.sqrt(filtered_data.shape[0] / (filtered_data.shape[0] - 1))
 
-        calculator = w.WeightsCalculatorFactory(config, iterations, tolerance, correction, scheme)
+        calculator = w.WeightsCalculatorFactory(config, iterations, tolerance, correction, scheme, acceleration)
         final_data, scores, weights = estimator.estimate(calculator, filtered_data)
+        self.__iterations = pd.Series({"iterations": estimator.iterations(),
+                                       "extrapolations": estimator.extrapolations()}, name="iterations")
         config = estimator.config()
 
         self.__inner_model = im.InnerModel(config.path(), scores)
-        self.__outer_model = om.OuterModel(final_data, scores, weights, config.odm(config.path()), self.__inner_model.r_squared())
+        self.__outer_model = om.OuterModel(final_data, scores, weights, config.blocks(config.path()), self.__inner_model.r_squared())
         self.__inner_summary = pis.InnerSummary(config, self.__inner_model.r_squared(),
                                                 self.__inner_model.r_squared_adj(), self.__outer_model.model())
         self.__unidimensionality = Unidimensionality(config, filtered_data, correction)
+        htmt = Htmt(config.blocks(config.path()))
+        self.__htmt = htmt.summary(final_data)
         self.__scores = scores
         self.__bootstrap = None
         if bootstrap:
             if (filtered_data.shape[0] < 10):
                 raise Exception("Bootstrapping could not be performed, at least 10 observations are required.")
             self.__bootstrap = Bootstrap(config, filtered_data, self.__inner_model, self.__outer_model, calculator,
-                                         bootstrap_iterations, processes)
+                                         bootstrap_iterations, processes, shared_memory, seed,
+                                         warm_start=warm_start, streaming=streaming, tolerance=bootstrap_tolerance,
+                                         round_size=bootstrap_round_size, checkpoint=bootstrap_checkpoint,
+                                         bayesian=bayesian_bootstrap, executor=executor,
+                                         blas_threads=blas_threads, subsample=bootstrap_subsample,
+                                         keep_draws=bootstrap_draws,
+                                         htmt=htmt.values(final_data) if bootstrap_htmt else None)
+        self.__jackknife = None
+        if jackknife:
+            self.__jackknife = Jackknife(config, filtered_data, self.__inner_model, self.__outer_model, calculator,
+                                         jackknife_group_size, processes, executor, seed,
+                                         blas_threads=blas_threads)
 
     def scores(self) -> pd.DataFrame:
         """Gets the latent variable scores
@@ -155,6 +199,22 @@ class Plspm:
         """
         return self.__unidimensionality.summary()
 
+    def htmt(self) -> pd.DataFrame:
+        """Gets the heterotrait-monotrait ratios of correlations (HTMT), used to assess discriminant validity
+
+        Returns:
+            a DataFrame with the latent variables as both the index and the columns, holding the ratio for each pair of latent variables below the diagonal. The ratio is missing for latent variables with a single manifest variable. Bootstrap intervals for the ratios are available from :meth:`.bootstrap.Bootstrap.htmt` if bootstrap_htmt was set.
+        """
+        return self.__htmt
+
+    def iterations(self) -> pd.Series:
+        """Gets the number of iterations the algorithm took to converge
+
+        Returns:
+            a Series with the number of iterations, and the number of them that were extrapolated if acceleration was requested.
+        """
+        return self.__iterations
+
     def bootstrap(self) -> Bootstrap:
         """Gets the results of bootstrap validation, if requested
 
@@ -167,3 +227,16 @@ class Plspm:
         if self.__bootstrap is None:
             raise Exception("To perform bootstrap validation, set the parameter bootstrap to True when calling Plspm")
         return self.__bootstrap
+
+    def jackknife(self) -> Jackknife:
+        """Gets the results of jackknife validation, if requested
+
+        Returns:
+            an instance of :class:`.jackknife.Jackknife` which can be queried for jackknife results
+
+        Raises:
+            Exception: if jackknife validation was not requested
+        """
+        if self.__jackknife is None:
+            raise Exception("To perform jackknife validation, set the parameter jackknife to True when calling Plspm")
+        return self.__jackknife
@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+#
+# Copyright (C) 2019 Google Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections, hashlib, os, pickle, threading, pandas as pd
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+# Objects this worker process has loaded from shared memory, by content key, least recently used first.
+_loaded = collections.OrderedDict()
+
+
+def _initialize():
+    # Import the estimation code up front, so that workers are warm by the time the first job arrives.
+    import plspm.bootstrap
+
+
+def _dataset_key(data: pd.DataFrame) -> str:
+    # The content key of a dataset, from a hash of each row (index included) and its columns and types, which is much
+    # cheaper than pickling the dataset.
+    digest = hashlib.sha256(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    digest.update(pickle.dumps((list(data.columns), [str(dtype) for dtype in data.dtypes])))
+    return digest.hexdigest()
+
+
+class _Shared:
+    """Internal handle on an object published to a :class:`WorkerPool`, which is cheap to send to the workers. Each
+    worker loads the object the first time it needs it and keeps it until it is among the least recently used."""
+    def __init__(self, key: str, name: str, size: int, cache_size: int):
+        self.__key = key
+        self.__name = name
+        self.__size = size
+        self.__cache_size = cache_size
+
+    def key(self) -> str:
+        return self.__key
+
+    def get(self):
+        if self.__key in _loaded:
+            _loaded.move_to_end(self.__key)
+            return _loaded[self.__key]
+        memory = SharedMemory(name=self.__name)
+        view = memory.buf[:self.__size]
+        try:
+            value = pickle.loads(view)
+        finally:
+            view.release()
+            memory.close()
+        _loaded[self.__key] = value
+        while len(_loaded) > self.__cache_size:
+            _loaded.popitem(last=False)
+        return value
+
+
+class WorkerPool(Executor):
+    """A pool of worker processes that can be used for the bootstrap validation of many models.
+
+    Creating worker processes, and shipping them the dataset, can take longer than bootstrapping a small model. Pass a
+    pool as the ``executor`` of as many :class:`.Plspm` instances as needed: its workers are started once and stay warm
+    between models. Each dataset is published to the workers once (in shared memory), keyed by its content, and each
+    worker keeps the ``cache_size`` datasets it used most recently, so models fitted on the same data do not ship it
+    again. The pool must be shut down explicitly by calling :meth:`shutdown`, or by using it as a context manager::
+
+        with WorkerPool() as pool:
+            for config in configs:
+                plspm_calc = Plspm(data, config, bootstrap=True, executor=pool)
+
+    A pool can be used by several :class:`.Plspm` instances at once, from different threads. It can also be used as
+    any other :class:`concurrent.futures.Executor`.
+    """
+    def __init__(self, processes: int = None, cache_size: int = 8):
+        """Starts the pool.
+
+        Args:
+            processes: The number of worker processes (default is the number of cores)
+            cache_size: The number of datasets to keep published to, and loaded in, the workers (default 8)
+        """
+        assert processes is None or processes > 0
+        assert cache_size > 0
+        self.__processes = processes or os.cpu_count()
+        self.__cache_size = cache_size
+        self.__executor = ProcessPoolExecutor(self.__processes, initializer=_initialize)
+        self.__lock = threading.Lock()
+        # Published blocks by key, least recently used first, with the size of the pickled object each holds, the
+        # number of jobs currently using each and whether it should be kept once no job is using it.
+        self.__published = collections.OrderedDict()
+
+    def processes(self) -> int:
+        """The number of worker processes in the pool."""
+        return self.__processes
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self.__executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, **kwargs):
+        """Stops the worker processes and releases the datasets published to them."""
+        self.__executor.shutdown(wait=wait, **kwargs)
+        with self.__lock:
+            for memory, _, _, _ in self.__published.values():
+                memory.close()
+                memory.unlink()
+            self.__published.clear()
+
+    def share(self, value, retain: bool = False) -> _Shared:
+        """Internal method that publishes an object to the workers, returning a handle to send to them instead.
+
+        Args:
+            value: The (picklable) object to publish.
+            retain: Whether to keep the object published after it has been released, for instance because it is a
+                dataset that other models are likely to be fitted on.
+        """
+        payload = None
+        if isinstance(value, pd.DataFrame):
+            # A dataset is only pickled if it has not been published yet.
+            key = _dataset_key(value)
+        else:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            key = hashlib.sha256(payload).hexdigest()
+        with self.__lock:
+            shared = self.__use(key, retain)
+        if shared is not None:
+            return shared
+        if payload is None:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.__lock:
+            # The same object may have been published by another thread in the meantime.
+            if key not in self.__published:
+                memory = SharedMemory(create=True, size=len(payload))
+                memory.buf[:len(payload)] = payload
+                self.__published[key] = (memory, len(payload), 0, False)
+            return self.__use(key, retain)
+
+    def __use(self, key: str, retain: bool) -> _Shared:
+        # Counts one more job using a published object, returning a handle on it, or None if it is not published.
+        if key not in self.__published:
+            return None
+        memory, size, users, retained = self.__published[key]
+        self.__published.move_to_end(key)
+        self.__published[key] = (memory, size, users + 1, retained or retain)
+        self.__evict()
+        return _Shared(key, memory.name, size, self.__cache_size)
+
+    def release(self, shared: _Shared):
+        """Internal method that signals a job no longer needs an object it published with :meth:`share`."""
+        with self.__lock:
+            memory, size, users, retained = self.__published[shared.key()]
+            self.__published[shared.key()] = (memory, size, users - 1, retained)
+            self.__evict()
+
+    def __evict(self):
+        # Unpublish objects nobody is using, except for the most recently used retained ones.
+        retained = 0
+        for key in reversed(list(self.__published)):
+            memory, _, users, retain = self.__published[key]
+            retained += retain
+            if users == 0 and (not retain or retained > self.__cache_size):
+                memory.close()
+                memory.unlink()
+                del self.__published[key]
@@ -27,6 +27,9 @@ class _CentroidInnerWeightCalculator(util.Value):
     def calculate(self, path: pd.DataFrame, y: np.ndarray) -> np.ndarray:
         return np.sign(np.corrcoef(y, rowvar=False) * (path + path.transpose()))
 
+    def calculate_batched(self, path: np.ndarray, covariance: np.ndarray) -> np.ndarray:
+        return np.sign(util.cov_to_corr(covariance) * (path + path.transpose()))
+
 
 class _FactorialInnerWeightCalculator(util.Value):
 
@@ -36,6 +39,9 @@ class _FactorialInnerWeightCalculator(util.Value):
     def calculate(self, path: pd.DataFrame, y: np.ndarray) -> np.ndarray:
         return np.cov(y, rowvar=False) * (path + path.transpose())
 
+    def calculate_batched(self, path: np.ndarray, covariance: np.ndarray) -> np.ndarray:
+        return covariance * (path + path.transpose())
+
 
 class _PathInnerWeightCalculator(util.Value):
 
@@ -53,6 +59,19 @@ class _PathInnerWeightCalculator(util.Value):
                 E[predec, i] = np.corrcoef(np.column_stack((y[:, predec], y[:, i])), rowvar=False)[:,-1][:-1]
         return E
 
+    def calculate_batched(self, path: np.ndarray, covariance: np.ndarray) -> np.ndarray:
+        E = np.repeat(path.astype(np.float64)[np.newaxis, :, :], covariance.shape[0], axis=0)
+        correlation = util.cov_to_corr(covariance)
+        for i in range(E.shape[1]):
+            follow = path[i, :] == 1
+            if follow.any():
+                E[:, follow, i] = np.matmul(np.linalg.pinv(covariance[:, follow, :][:, :, follow]),
+                                            covariance[:, follow, i, np.newaxis])[:, :, 0]
+            predec = path[:, i] == 1
+            if predec.any():
+                E[:, predec, i] = correlation[:, predec, i]
+        return E
+
 
 class Scheme(Enum):
     """
@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+#
+# Copyright (C) 2019 Google Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+
+class Moments:
+    """Internal class that keeps the running count, mean and sum of squared deviations of a set of parameters, using
+    Welford's algorithm. Missing (NaN) values are skipped, as pandas does."""
+    def __init__(self, parameters: int):
+        self.__count = np.zeros(parameters)
+        self.__mean = np.zeros(parameters)
+        self.__m2 = np.zeros(parameters)
+
+    def update(self, draws: np.ndarray):
+        """Internal method that adds a batch of draws, with a row per draw and a column per parameter."""
+        count = np.isfinite(draws).sum(axis=0).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, np.nansum(draws, axis=0) / count, 0)
+            m2 = np.nansum(np.power(draws - mean, 2), axis=0)
+        self.__combine(count, mean, m2)
+
+    def merge(self, other: "Moments"):
+        """Internal method that merges the moments of another (disjoint) set of draws into these."""
+        self.__combine(other.__count, other.__mean, other.__m2)
+
+    def __combine(self, count: np.ndarray, mean: np.ndarray, m2: np.ndarray):
+        total = self.__count + count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - self.__mean
+            self.__mean = np.where(total > 0, self.__mean + delta * count / total, 0)
+            self.__m2 = np.where(total > 0, self.__m2 + m2 + np.power(delta, 2) * self.__count * count / total, 0)
+        self.__count = total
+
+    def state(self) -> dict:
+        """Internal method that returns the state of the moments as arrays, so that it can be saved."""
+        return {"count": self.__count, "mean": self.__mean, "m2": self.__m2}
+
+    def restore(self, state: dict):
+        """Internal method that restores the state returned by :meth:`state`."""
+        self.__count, self.__mean, self.__m2 = state["count"], state["mean"], state["m2"]
+
+    def count(self) -> np.ndarray:
+        return self.__count
+
+    def mean(self) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            return np.where(self.__count > 0, self.__mean, np.nan)
+
+    def std(self) -> np.ndarray:
+        """Internal method that returns the sample standard deviation (with denominator n - 1, as pandas uses)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.__count > 1, np.sqrt(self.__m2 / (self.__count - 1)), np.nan)
+
+
+class QuantileSketch:
+    """Internal class that keeps a mergeable approximation of the distribution of a set of parameters, in memory that
+    does not depend on the number of draws.
+
+    Draws are kept in levels of at most ``capacity`` rows, where each row in level ``h`` stands for ``2 ** h`` draws.
+    When a level overflows, its rows are sorted (separately for each parameter) and every other one is promoted to the
+    next level. Quantiles are exact until the first level overflows."""
+    def __init__(self, parameters: int, capacity: int = 256):
+        self.__parameters = parameters
+        self.__capacity = capacity
+        self.__levels = [np.empty((0, parameters))]
+
+    def update(self, draws: np.ndarray):
+        """Internal method that adds a batch of draws, with a row per draw and a column per parameter."""
+        self.__add(0, draws)
+
+    def merge(self, other: "QuantileSketch"):
+        """Internal method that merges the sketch of another (disjoint) set of draws into this one."""
+        for level, items in enumerate(other.__levels):
+            self.__add(level, items)
+
+    def __add(self, level: int, items: np.ndarray):
+        while True:
+            if level == len(self.__levels):
+                self.__levels.append(np.empty((0, self.__parameters)))
+            items = np.concatenate([self.__levels[level], items], axis=0)
+            if items.shape[0] <= self.__capacity:
+                self.__levels[level] = items
+                return
+            # Keep an odd item back so that every promoted row stands for exactly two rows of this level. The offset
+            # alternates between levels so that the compaction does not consistently favour the smaller items.
+            keep = items.shape[0] % 2
+            items = np.sort(items, axis=0)
+            self.__levels[level] = items[items.shape[0] - keep:, :]
+            items = items[level % 2:items.shape[0] - keep:2, :]
+            level += 1
+
+    def state(self) -> dict:
+        """Internal method that returns the state of the sketch as arrays, so that it can be saved."""
+        return {"items": np.concatenate(self.__levels, axis=0),
+                "levels": np.array([items.shape[0] for items in self.__levels])}
+
+    def restore(self, state: dict):
+        """Internal method that restores the state returned by :meth:`state`."""
+        self.__levels = np.split(state["items"], np.cumsum(state["levels"])[:-1], axis=0)
+
+    def quantile(self, q: float) -> np.ndarray:
+        """Internal method that returns the q-th quantile of each parameter, ignoring missing values."""
+        if len(self.__levels) == 1:
+            with np.errstate(invalid="ignore"):
+                return np.nanquantile(self.__levels[0], q, axis=0) if self.__levels[0].shape[0] > 0 \
+                    else np.full(self.__parameters, np.nan)
+        values = np.concatenate(self.__levels, axis=0)
+        weights = np.concatenate([np.full(items.shape[0], 2.0 ** level) for level, items in enumerate(self.__levels)])
+        order = np.argsort(values, axis=0)
+        values = np.take_along_axis(values, order, axis=0)
+        weights = np.where(np.isnan(values), 0, weights[order])
+        # Each item sits at the middle of the span of ranks it stands for; interpolate linearly between items.
+        cumulative = np.cumsum(weights, axis=0) - weights / 2
+        total = weights.sum(axis=0)
+        result = np.full(self.__parameters, np.nan)
+        for parameter in range(self.__parameters):
+            finite = weights[:, parameter] > 0
+            if finite.any():
+                result[parameter] = np.interp(q * total[parameter], cumulative[finite, parameter],
+                                              values[finite, parameter])
+        return result
+
+
+class StreamingSummary:
+    """Internal class that summarises the bootstrap draws of a family of parameters without keeping the draws."""
+    def __init__(self, parameters: int):
+        self.__moments = Moments(parameters)
+        self.__sketch = QuantileSketch(parameters)
+
+    def update(self, draws: np.ndarray):
+        self.__moments.update(draws)
+        self.__sketch.update(draws)
+
+    def merge(self, other: "StreamingSummary"):
+        self.__moments.merge(other.__moments)
+        self.__sketch.merge(other.__sketch)
+
+    def state(self) -> dict:
+        state = {"moments." + key: value for key, value in self.__moments.state().items()}
+        state.update({"sketch." + key: value for key, value in self.__sketch.state().items()})
+        return state
+
+    def restore(self, state: dict):
+        self.__moments.restore({key[len("moments."):]: value for key, value in state.items()
+                                if key.startswith("moments.")})
+        self.__sketch.restore({key[len("sketch."):]: value for key, value in state.items()
+                               if key.startswith("sketch.")})
+
+    def count(self) -> np.ndarray:
+        return self.__moments.count()
+
+    def mean(self) -> np.ndarray:
+        return self.__moments.mean()
+
+    def std(self) -> np.ndarray:
+        return self.__moments.std()
+
+    def quantile(self, q: float) -> np.ndarray:
+        return self.__sketch.quantile(q)
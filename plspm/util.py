@@ -16,9 +16,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import pandas as pd, math, numpy as np, collections as c
+from typing import Tuple
 
 
-def treat(data: pd.DataFrame, center: bool = True, scale: bool = True, scale_values=None) -> pd.DataFrame:
+def treat(data: pd.DataFrame, center: bool = True, scale: bool = True, scale_values=None,
+          frequencies: np.ndarray = None) -> pd.DataFrame:
     """Internal function that treats data in Pandas Dataframe format.
 
     Args:
@@ -26,20 +28,48 @@ def treat(data: pd.DataFrame, center: bool = True, scale: bool = True, scale_val
         center: Whether to center the data
         scale: Whether to scale the data
         scale_values: The scaling to use
+        frequencies: Optionally, the number of times each observation occurs (see :func:`weighted_mean`)
 
     Returns:
         The treated data
     """
     if center:
-        data = data.subtract(data.mean())
+        data = data.subtract(data.mean() if frequencies is None else weighted_mean(data, frequencies))
     if scale:
         if scale_values:
             data = data.divide(scale_values)
         else:
-            data = data.divide(data.std())
+            data = data.divide(data.std() if frequencies is None else weighted_std(data, frequencies))
     return data
 
 
+def weighted_mean(data: pd.DataFrame, frequencies: np.ndarray) -> pd.Series:
+    """Internal function that calculates the mean of each column, skipping missing values, when each observation occurs
+    the given number of times. This gives the same result as materialising the repeated observations, for instance those
+    of a bootstrap resample, without doing so. The frequencies need not be whole numbers.
+    """
+    present = data.notnull().values * frequencies[:, np.newaxis]
+    return pd.Series(np.nansum(data.values * frequencies[:, np.newaxis], axis=0) / present.sum(axis=0),
+                     index=data.columns)
+
+
+def weighted_std(data: pd.DataFrame, frequencies: np.ndarray) -> pd.Series:
+    """Internal function that calculates the sample standard deviation of each column (with denominator n - 1, as pandas
+    uses, where n is the total frequency) when each observation occurs the given number of times."""
+    present = data.notnull().values * frequencies[:, np.newaxis]
+    deviations = np.power(data.values - weighted_mean(data, frequencies).values, 2)
+    return pd.Series(np.sqrt(np.nansum(deviations * frequencies[:, np.newaxis], axis=0) / (present.sum(axis=0) - 1)),
+                     index=data.columns)
+
+
+def weighted_cov(values: np.ndarray, frequencies: np.ndarray) -> np.ndarray:
+    """Internal function that calculates the covariance matrix of the columns of a matrix without missing values (with
+    denominator n - 1, as numpy uses) when each observation occurs the given number of times."""
+    total = frequencies.sum()
+    centered = values - frequencies.dot(values) / total
+    return np.dot(centered.T, centered * frequencies[:, np.newaxis]) / (total - 1)
+
+
 def treat_numpy(data: np.ndarray) -> np.ndarray:
     """Internal function that centers and scales data in Numpy format.
 
@@ -53,21 +83,79 @@ def treat_numpy(data: np.ndarray) -> np.ndarray:
     return data / np.nanstd(data, axis=0, ddof=1)
 
 
+def cov_to_corr(covariance: np.ndarray) -> np.ndarray:
+    """Internal function that converts a stack of covariance matrices into correlation matrices."""
+    std = np.sqrt(np.diagonal(covariance, axis1=-2, axis2=-1))
+    return covariance / (std[..., :, np.newaxis] * std[..., np.newaxis, :])
+
+
 def sort_cols(data: pd.DataFrame) -> pd.DataFrame:
     """Internal convenience function to sort data by column."""
     return data.reindex(sorted(data.columns), axis=1)
 
 
-def impute(data: pd.DataFrame) -> pd.DataFrame:
+def impute(data: pd.DataFrame, frequencies: np.ndarray = None) -> pd.DataFrame:
     """Internal function that imputes missing data using the mean value (only suitable for metric data)."""
     imputed = pd.DataFrame(0, data.index, data.columns)
+    averages = data.mean(skipna=True) if frequencies is None else weighted_mean(data, frequencies)
     for column in list(data):
-        average = data[column].mean(skipna=True)
-        imputed[column] = data[column].fillna(average)
-        assert math.isclose(imputed[column].mean(), average, rel_tol=1e-09, abs_tol=0.0)
+        imputed[column] = data[column].fillna(averages[column])
+    means = imputed.mean() if frequencies is None else weighted_mean(imputed, frequencies)
+    for column in list(data):
+        assert math.isclose(means[column], averages[column], rel_tol=1e-09, abs_tol=0.0)
     return imputed
 
 
+class Blocks:
+    """Internal class that holds the outer design matrix in block-sparse form.
+
+    Each MV belongs to a single LV, so with the MVs ordered by LV, the outer design matrix is block diagonal: each LV's
+    block is a contiguous range of MVs. Outer weights are then a flat array with one weight per MV, rather than an outer
+    design matrix with one column per LV, and products with them are computed block by block, so that they cost as much
+    as the number of MVs rather than the number of MVs times the number of LVs."""
+    def __init__(self, mvs: dict):
+        self.__lvs = list(mvs)
+        self.__mvs = [mv for lv in self.__lvs for mv in mvs[lv]]
+        sizes = [len(mvs[lv]) for lv in self.__lvs]
+        self.__starts = np.cumsum([0] + sizes[:-1]).astype(int)
+        self.__slices = [slice(start, start + size) for start, size in zip(self.__starts, sizes)]
+        self.__lv_index = np.repeat(np.arange(len(self.__lvs)), sizes)
+
+    def mvs(self) -> list:
+        """Internal method that returns the MVs, ordered by LV."""
+        return self.__mvs
+
+    def lvs(self) -> list:
+        return self.__lvs
+
+    def lv_index(self) -> np.ndarray:
+        """Internal method that returns the position of the LV of each MV."""
+        return self.__lv_index
+
+    def slices(self) -> list:
+        """Internal method that returns the range of MVs of each LV."""
+        return self.__slices
+
+    def sum(self, values: np.ndarray, axis: int = -1) -> np.ndarray:
+        """Internal method that sums the values for the MVs of each LV along an axis, as a product with the outer design
+        matrix would."""
+        return np.add.reduceat(values, self.__starts, axis=axis)
+
+    def dot(self, matrix: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Internal method that multiplies a matrix (or a stack of matrices) with a column per MV by the outer weights
+        (or a stack of them), returning a column per LV: the scores, if the matrix is the data."""
+        product = np.empty(matrix.shape[:-1] + (len(self.__lvs),))
+        for column, rows in enumerate(self.__slices):
+            product[..., column] = np.matmul(matrix[..., rows], weights[..., rows, np.newaxis])[..., 0]
+        return product
+
+    def covariance(self, moments: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Internal method that returns, for a stack of covariance matrices of the MVs and of outer weights, the
+        covariance between the MVs and the scores and the covariance matrix of the scores."""
+        cross = self.dot(moments, weights)
+        return cross, self.sum(cross * weights[:, :, np.newaxis], axis=1)
+
+
 def list_to_dummy(data: dict) -> pd.DataFrame:
     """Internal function used to create the outer design matrix."""
     matrix = pd.DataFrame()
@@ -95,6 +183,21 @@ def dummy(data: pd.Series) -> pd.DataFrame:
     return dummy
 
 
+def rank_codes(codes: np.ndarray, categories: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Internal function that ranks ordinal and nominal data from integer codes (-1 where missing), returning the same
+    ranks and dummy matrix as :func:`rank` and :func:`dummy` would for the values the codes stand for. Codes that do
+    not occur are skipped, so that the ranks are consecutive."""
+    present = codes >= 0
+    occurs = np.bincount(codes[present], minlength=categories) > 0
+    dense = np.cumsum(occurs) - 1
+    ranks = np.full(codes.shape[0], np.nan)
+    ranks[present] = dense[codes[present]] + 1
+    # Like pandas' unique, dummy counts missing values as one more value, which never matches a rank.
+    dummies = np.zeros((codes.shape[0], occurs.sum() + (0 if present.all() else 1)), dtype=np.int64)
+    dummies[np.flatnonzero(present), dense[codes[present]]] = 1
+    return ranks, dummies
+
+
 def groupby_mean(data: np.ndarray) -> np.ndarray:
     """Internal function which performs the Numpy equivalent of Pandas ``.groupby(...).mean()``"""
     values = {}
@@ -15,64 +15,135 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import numpy as np, pandas as pd, plspm.config as c, statsmodels.api as sm, plspm.util as util, math
+import numpy as np, pandas as pd, plspm.config as c, statsmodels.api as sm, plspm.util as util
 from typing import Tuple
 from plspm.scheme import Scheme
 from plspm.mode import Mode
+from plspm.scale import Scale
+from plspm.acceleration import Acceleration
 
 pd.options.mode.chained_assignment = None  # default='warn'
 
 
+# Metric data with at least this many observations per MV is estimated from its covariance matrix (see
+# _CovarianceWeights), which is cheaper once the data is much longer than it is wide.
+_COVARIANCE_OBSERVATIONS_PER_MV = 64
+
+
+class ConvergenceError(Exception):
+    """Raised when the algorithm does not converge within the maximum number of iterations."""
+
+
+def _initial_weight_blocks(config: c.Config, path: pd.DataFrame, initial_weights: pd.DataFrame):
+    # Blocks for which every MV has an initial weight (e.g. from a previous estimation of the model). Any other block
+    # starts from the usual unit weights.
+    if initial_weights is None:
+        return []
+    return [(lv, config.mvs(lv)) for lv in list(path) if set(config.mvs(lv)).issubset(initial_weights.index)]
+
+
 class _MetricWeights:
-    """Internal class that calculates weights and scores when using metric data."""
-    def __init__(self, data: pd.DataFrame, config: c.Config, correction: float, path: pd.DataFrame):
-        odm = config.odm(path)
-        weight_factors = correction / data.dot(odm).std(axis=0)
-        self.__mvs = list(odm.index)
-        wf_diag = pd.DataFrame(np.diag(weight_factors), index=weight_factors.index, columns=weight_factors.index)
-        weights = odm.dot(wf_diag)
-        self.__weights_old = weights.sum(axis=1).to_frame(name="weight")
+    """Internal class that calculates weights and scores when using metric data.
+
+    The labels of the MVs and LVs are resolved into positions once, so that the iterations only operate on arrays: the
+    data as a matrix with its columns in the order of the outer design matrix, the weights as a flat array with one
+    weight per MV (see :class:`.util.Blocks`), and each block as a slice of the data's columns, along with anything its
+    mode needs to compute its weights that does not change between iterations, such as the pseudo-inverse of a mode B
+    block. Labels are attached again by :meth:`calculate`."""
+    def __init__(self, data: pd.DataFrame, config: c.Config, correction: float, path: pd.DataFrame,
+                 initial_weights: pd.DataFrame = None, frequencies: np.ndarray = None):
+        odm = config.blocks(path)
+        self.__mvs = odm.mvs()
+        self.__lvs = odm.lvs()
+        self.__values = data.loc[:, self.__mvs].values.astype(np.float64)
+        self.__blocks = []
+        for column, (lv, rows) in enumerate(zip(self.__lvs, odm.slices())):
+            mode = config.mode(lv).value
+            block = self.__values[:, rows]
+            self.__blocks.append((mode, rows, block, column, mode.solver(block, frequencies)))
+        weights = np.ones(len(self.__mvs))
+        weights = weights * (correction / self.__std(odm.dot(self.__values, weights), frequencies))[odm.lv_index()]
+        for lv, mvs in _initial_weight_blocks(config, path, initial_weights):
+            weights[odm.slices()[self.__lvs.index(lv)]] = initial_weights.loc[mvs, "weight"].values
+        self.__weights_old = weights.copy()
+        self.__reference = weights.copy()
+        self.__odm = odm
         self.__data = data
-        self.__config = config
         self.__weights = weights
         self.__correction = correction
-        self.__path = path
+        self.__path = path.values
+        self.__frequencies = frequencies
+
+    @staticmethod
+    def __std(values: np.ndarray, frequencies: np.ndarray) -> np.ndarray:
+        if frequencies is None:
+            return values.std(axis=0, ddof=1)
+        total = frequencies.sum()
+        deviations = values - frequencies.dot(values) / total
+        return np.sqrt(frequencies.dot(np.power(deviations, 2)) / (total - 1))
+
+    def __cov(self, values: np.ndarray) -> np.ndarray:
+        if self.__frequencies is None:
+            return np.cov(values, rowvar=False)
+        return util.weighted_cov(values, self.__frequencies)
+
+    def __cor(self, scores: np.ndarray) -> np.ndarray:
+        # The correlations between the MVs and the scores, without forming the covariance matrix of the MVs.
+        frequencies = np.ones(scores.shape[0]) if self.__frequencies is None else self.__frequencies
+        total = frequencies.sum()
+        values = self.__values - frequencies.dot(self.__values) / total
+        scores = scores - frequencies.dot(scores) / total
+        cross = values.T.dot(scores * frequencies[:, np.newaxis])
+        return cross / np.outer(np.sqrt(frequencies.dot(np.power(values, 2))),
+                                np.sqrt(frequencies.dot(np.power(scores, 2))))
 
     def iterate(self, inner_weight_calculator: Scheme) -> float:
-        lvs = list(self.__path)
-        scores = self.__data.dot(self.__weights).reindex(lvs, axis=1)
-        scores = util.treat(scores) / self.__correction
-        inner_weights = pd.DataFrame(inner_weight_calculator.value.calculate(self.__path, scores.values), index=lvs, columns=lvs)
+        scores = self.__odm.dot(self.__values, self.__weights)
+        if self.__frequencies is None:
+            scores = scores - scores.mean(axis=0)
+        else:
+            scores = scores - self.__frequencies.dot(scores) / self.__frequencies.sum()
+        scores = scores / (self.__std(scores, self.__frequencies) * self.__correction)
+        # The inner weights are calculated from the covariance of the scores, as they are for batches of resamples.
+        inner_weights = inner_weight_calculator.value.calculate_batched(self.__path,
+                                                                        self.__cov(scores)[np.newaxis, :, :])[0]
         Z = scores.dot(inner_weights)
-        for lv in list(lvs):
-            mvs = self.__config.mvs(lv)
-            weights = self.__config.mode(lv).value.outer_weights_metric(self.__data, Z, lv, mvs)
-            self.__weights.loc[mvs, [lv]] = weights
-        weights_new = self.__weights.sum(axis=1).to_frame(name="weight")
-        convergence = np.power(self.__weights_old.abs() - weights_new.abs(), 2).sum(axis=1).sum(axis=0)
-        self.__weights_old = weights_new
+        for mode, rows, block, column, solver in self.__blocks:
+            self.__weights[rows] = mode.outer_weights_metric(block, Z[:, column], self.__frequencies, solver)
+        convergence = np.power(np.abs(self.__weights_old) - np.abs(self.__weights), 2).sum()
+        self.__weights_old = self.__weights.copy()
         return convergence
 
+    def state(self) -> np.ndarray:
+        """Internal method that returns the current outer weights as a flat array (see :mod:`.acceleration`).
+
+        Flipping the sign of a block's weights flips the sign of its next weights and leaves the others unchanged, and
+        the sign of a block can alternate between iterations. The sign of each block is therefore chosen to agree with
+        the initial weights, so that consecutive states can be extrapolated from."""
+        signs = np.copysign(1.0, self.__odm.sum(self.__weights * self.__reference))
+        return self.__weights * signs[self.__odm.lv_index()]
+
+    def restore(self, state: np.ndarray):
+        """Internal method that replaces the current outer weights with those from :meth:`state`."""
+        self.__weights = state.copy()
+        self.__weights_old = state.copy()
+
     def calculate(self) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-        weight_factors = 1 / (self.__data.dot(self.__weights).std(axis=0) / self.__correction)
-        wf_diag = pd.DataFrame(np.diag(weight_factors), index=weight_factors.index, columns=weight_factors.index)
-        weights = self.__weights.dot(wf_diag)
-        scores = self.__data.dot(weights)
-        cor = pd.concat([self.__data, scores], axis=1).corr().loc[list(self.__data), list(scores)]
-        odm = weights.apply(lambda x: x!= 0).astype(int)
-        sign = lambda x : math.copysign(1.0, x)
-        w_sign = (cor * odm).applymap(sign).sum(axis=0).apply(sign)
-        if -1 in w_sign.values:
-            w_sign = w_sign.apply(lambda x : -1 if x == 0 else x)
-            w_sign_matrix = pd.DataFrame(np.diag(w_sign), index=w_sign.index, columns=w_sign.index)
-            scores = scores.dot(w_sign_matrix)
-        weights = pd.DataFrame(weights.sum(axis=1), index=self.__mvs, columns=["weight"])
+        std = self.__std(self.__odm.dot(self.__values, self.__weights), self.__frequencies) / self.__correction
+        weights = self.__weights / std[self.__odm.lv_index()]
+        scores = self.__odm.dot(self.__values, weights)
+        # A score's sign is flipped if most of its correlations with the MVs, those of every block, are negative.
+        w_sign = np.copysign(1.0, np.copysign(1.0, self.__cor(scores)).sum(axis=0))
+        scores = pd.DataFrame(scores * w_sign, index=self.__data.index, columns=self.__lvs)
+        weights = pd.DataFrame(weights, index=self.__mvs, columns=["weight"])
         return self.__data, scores, weights
 
 
 class _NonmetricWeights:
     """Internal class that calculates weights and scores when using nonmetric data."""
-    def __init__(self, data: pd.DataFrame, config: c.Config, correction: float, path: pd.DataFrame):
+    def __init__(self, data: pd.DataFrame, config: c.Config, correction: float, path: pd.DataFrame,
+                 initial_weights: pd.DataFrame = None):
+        initial = dict(_initial_weight_blocks(config, path, initial_weights))
         self.__mv_grouped_by_lv_initial = {}
         self.__mvs = []
         mv_grouped_by_lv = {}
@@ -86,6 +157,8 @@ class _NonmetricWeights:
             self.__mv_grouped_by_lv_initial[lv] = mv_grouped_by_lv[lv].copy()
             sizes = mv_grouped_by_lv[lv].shape[1]
             weight = [1 / np.sqrt(sizes)] * sizes
+            if lv in initial:
+                weight = initial_weights.loc[mvs, "weight"].values
             if np.isnan(np.sum(mv_grouped_by_lv[lv])):
                 self.__mv_grouped_by_lv_missing[lv] = 1 - np.isnan(mv_grouped_by_lv[lv])
                 for j in range(len(data.index)):
@@ -96,8 +169,14 @@ class _NonmetricWeights:
                     scores[j, i] = numerator / denominator
             else:
                 scores[:, i] = np.dot(mv_grouped_by_lv[lv], weight)
+        # The quantification of MVs with a numeric or raw scale does not change after the first iteration, so neither
+        # does the solution of a mode B block made of them (see _ModeB.solver), once it has been computed.
+        self.__fixed = [lv for lv in lvs if lv not in self.__mv_grouped_by_lv_missing
+                        and all(config.scale(mv) in (Scale.NUM, Scale.RAW) for mv in config.mvs(lv))]
+        self.__solvers = {}
         self.__weights = {}
         self.__scores = scores
+        self.__reference = scores.copy()
         self.__mv_grouped_by_lv = mv_grouped_by_lv
         self.__config = config
         self.__correction = correction
@@ -113,23 +192,38 @@ class _NonmetricWeights:
             for j, mv in enumerate(list(self.__config.mvs(lv))):
                 self.__mv_grouped_by_lv[lv][:, j] = \
                     self.__config.scale(mv).value.scale(lv, mv, Z[:, i], self)
+            mode = self.__config.mode(lv).value
+            if lv in self.__fixed and lv not in self.__solvers:
+                self.__solvers[lv] = mode.solver(self.__mv_grouped_by_lv[lv])
             self.__weights[lv], self.__scores[:, i] = \
-                self.__config.mode(lv).value.outer_weights_nonmetric(self.__mv_grouped_by_lv,
-                                                                     self.__mv_grouped_by_lv_missing, Z[:, i], lv,
-                                                                     self.__correction)
+                mode.outer_weights_nonmetric(self.__mv_grouped_by_lv, self.__mv_grouped_by_lv_missing, Z[:, i], lv,
+                                             self.__correction, self.__solvers.get(lv))
         return np.power(np.abs(scores_old) - np.abs(self.__scores), 2).sum()
 
+    def state(self) -> np.ndarray:
+        """Internal method that returns the current scores as a flat array (see :mod:`.acceleration`). The weights and
+        quantification of the next iteration only depend on them. As for :meth:`_MetricWeights.state`, the sign of each
+        score is chosen to agree with the initial scores."""
+        signs = np.copysign(1.0, (self.__scores * self.__reference).sum(axis=0))
+        return (self.__scores * signs).ravel()
+
+    def restore(self, state: np.ndarray):
+        """Internal method that replaces the current scores with those from :meth:`state`."""
+        self.__scores = state.reshape(self.__scores.shape).copy()
+
     def calculate(self) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
         lvs = list(self.__path)
-        weights = pd.DataFrame(0, index=self.__mvs, columns=lvs)
-        data_new = pd.DataFrame(0, index=self.__index, columns=self.__mvs)
-        for lv in lvs:
-            mvs = self.__config.mvs(lv)
-            weights.loc[mvs, [lv]] = self.__weights[lv]
-            data_new.loc[:, mvs] = self.__mv_grouped_by_lv[lv]
-        weight_factors = 1 / (data_new.dot(weights).std(axis=0, skipna=True) / self.__correction)
-        wf_diag = pd.DataFrame(np.diag(weight_factors), index=lvs, columns=lvs)
-        weights = weights.dot(wf_diag).sum(axis=1).to_frame(name="weight")
+        odm = self.__config.blocks(self.__path)
+        data_new = pd.DataFrame(np.hstack([self.__mv_grouped_by_lv[lv] for lv in lvs]), index=self.__index,
+                                columns=odm.mvs())
+        weights = np.concatenate([self.__weights[lv] for lv in lvs])
+        scores = odm.dot(data_new.values, weights)
+        # The weights are scaled from the observations that have every MV, as they would be by the product with the
+        # outer design matrix, where a missing value in any block makes every score missing.
+        scores[np.isnan(data_new.values).any(axis=1), :] = np.nan
+        # Weights that cannot be scaled (if no observation has every MV) are zero.
+        weight_factors = 1 / (pd.DataFrame(scores).std(axis=0, skipna=True).values / self.__correction)
+        weights = pd.DataFrame(weights * weight_factors[odm.lv_index()], index=odm.mvs(), columns=["weight"]).fillna(0)
         return data_new, pd.DataFrame(self.__scores, index=self.__index, columns=lvs), weights
 
     def get_Z_for_mode_b(self, lv, mv, z_by_lv):
@@ -154,34 +248,233 @@ class _NonmetricWeights:
         return self.__config.dummies(mv)
 
 
+class _BatchedMetricWeights:
+    """Internal class that calculates weights for a batch of resamples of metric data at once.
+
+    Each resample is represented by the covariance matrix of its treated data, with rows and columns in the order of the
+    outer design matrix, and its weights by a row with one weight per MV (see :class:`.util.Blocks`). Every step of
+    :class:`_MetricWeights` is expressed in terms of these matrices, so an iteration over the whole batch is a handful
+    of batched matrix products. As for :class:`_MetricWeights`, what the mode of each block needs that does not change
+    between iterations is computed once."""
+    def __init__(self, moments: np.ndarray, config: c.Config, correction: float, path: pd.DataFrame,
+                 initial_weights: pd.DataFrame = None):
+        odm = config.blocks(path)
+        self.__blocks = []
+        # Resamples whose moments are not finite have no finite weights, so they are never iterated (see finite()).
+        finite = np.isfinite(moments).all(axis=(1, 2))
+        for column, (lv, rows) in enumerate(zip(odm.lvs(), odm.slices())):
+            solver = config.mode(lv).value.batched_solver(moments[finite], rows)
+            if solver is not None:
+                solvers = np.full((moments.shape[0],) + solver.shape[1:], np.nan)
+                solvers[finite] = solver
+                solver = solvers
+            self.__blocks.append((config.mode(lv), rows, column, solver))
+        weights = np.ones(moments.shape[:2])
+        _, covariance = odm.covariance(moments, weights)
+        variance = np.diagonal(covariance, axis1=1, axis2=2)
+        self.__weights = weights / np.sqrt(variance)[:, odm.lv_index()]
+        for lv, mvs in _initial_weight_blocks(config, path, initial_weights):
+            self.__weights[:, odm.slices()[odm.lvs().index(lv)]] = initial_weights.loc[mvs, "weight"].values
+        self.__weights_old = self.__weights.copy()
+        self.__reference = self.__weights.copy()
+        self.__odm = odm
+        self.__moments = moments
+        self.__correction = correction
+        self.__path = path.values
+
+    def finite(self) -> np.ndarray:
+        """Internal method that returns which resamples currently have finite weights (e.g. not a constant block)."""
+        return np.isfinite(self.__weights_old).all(axis=1)
+
+    def iterate(self, inner_weight_calculator: Scheme, active: np.ndarray) -> np.ndarray:
+        moments = self.__moments[active]
+        weights = self.__weights[active]
+        # Standardise the scores in the same way as _MetricWeights, then work with the covariance of the scores.
+        cross, covariance = self.__odm.covariance(moments, weights)
+        std = np.sqrt(np.diagonal(covariance, axis1=1, axis2=2)) * self.__correction ** 2
+        cross = cross / std[:, np.newaxis, :]
+        covariance = covariance / (std[:, :, np.newaxis] * std[:, np.newaxis, :]) * self.__correction ** 2
+        inner_weights = inner_weight_calculator.value.calculate_batched(self.__path, covariance)
+        cross = np.matmul(cross, inner_weights)
+        weights = np.empty_like(weights)
+        for mode, rows, column, solver in self.__blocks:
+            weights[:, rows] = mode.value.outer_weights_batched(moments, cross, rows, column,
+                                                                None if solver is None else solver[active])
+        self.__weights[active] = weights
+        convergence = np.power(np.abs(self.__weights_old[active]) - np.abs(weights), 2).sum(axis=1)
+        self.__weights_old[active] = weights
+        return convergence
+
+    def state(self) -> np.ndarray:
+        """Internal method that returns the current weights of every resample, with the sign of each block chosen as in
+        :meth:`_MetricWeights.state`."""
+        signs = np.copysign(1.0, self.__odm.sum(self.__weights * self.__reference, axis=1))
+        return self.__weights * signs[:, self.__odm.lv_index()]
+
+    def restore(self, weights: np.ndarray):
+        """Internal method that replaces the current weights of every resample with those from :meth:`state`."""
+        self.__weights = weights.copy()
+        self.__weights_old = weights.copy()
+
+    def calculate(self) -> Tuple[np.ndarray, np.ndarray]:
+        cross, covariance = self.__odm.covariance(self.__moments, self.__weights)
+        std = np.sqrt(np.diagonal(covariance, axis1=1, axis2=2))
+        weights = self.__weights / std[:, self.__odm.lv_index()]
+        # Same sign correction as _MetricWeights: it only applies to the scores, not the weights.
+        cor = cross / std[:, np.newaxis, :] / np.sqrt(np.diagonal(self.__moments, axis1=1, axis2=2))[:, :, np.newaxis]
+        w_sign = np.copysign(1.0, np.copysign(1.0, cor).sum(axis=1))
+        return weights, w_sign
+
+
+class _CovarianceWeights:
+    """Internal class that calculates weights and scores when using metric data, from the covariance matrix of the data.
+
+    The PLS algorithm only depends on the data through its covariance matrix, so this is formed once and the iterations
+    are those of :class:`_BatchedMetricWeights` for a batch of one, which cost O(p^2) for p MVs whatever the number of
+    observations. The scores are only calculated from the data once the weights have converged."""
+    def __init__(self, data: pd.DataFrame, config: c.Config, correction: float, path: pd.DataFrame,
+                 initial_weights: pd.DataFrame = None):
+        self.__odm = config.blocks(path)
+        self.__values = data.loc[:, self.__odm.mvs()].values.astype(np.float64)
+        centered = self.__values - self.__values.mean(axis=0)
+        moments = centered.T.dot(centered)[np.newaxis, :, :] / centered.shape[0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.__calculator = _BatchedMetricWeights(moments, config, correction, path, initial_weights)
+        self.__active = np.zeros(1, dtype=int)
+        self.__data = data
+        self.__correction = correction
+
+    def iterate(self, inner_weight_calculator: Scheme) -> float:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.__calculator.iterate(inner_weight_calculator, self.__active)[0]
+
+    def state(self) -> np.ndarray:
+        return self.__calculator.state()[0]
+
+    def restore(self, state: np.ndarray):
+        self.__calculator.restore(state[np.newaxis, :])
+
+    def calculate(self) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        weights, w_sign = self.__calculator.calculate()
+        # The weights give scores with a variance of one (with denominator n); rescale them to the correction.
+        observations = self.__values.shape[0]
+        weights = weights[0] * self.__correction / np.sqrt(observations / (observations - 1))
+        scores = pd.DataFrame(self.__odm.dot(self.__values, weights) * w_sign[0], index=self.__data.index,
+                              columns=self.__odm.lvs())
+        weights = pd.DataFrame(weights, index=self.__odm.mvs(), columns=["weight"])
+        return self.__data, scores, weights
+
+
 class WeightsCalculatorFactory:
     """Internal class that is used to calculate weights and scores from the data using the model."""
-    def __init__(self, config: c.Config, iterations: int, tolerance: float, correction: float, scheme: Scheme):
+    def __init__(self, config: c.Config, iterations: int, tolerance: float, correction: float, scheme: Scheme,
+                 acceleration: Acceleration = None):
         self.__iterations = iterations
         self.__tolerance = tolerance
         self.__config = config
         self.__correction = correction
         self.__scheme = scheme
+        self.__acceleration = acceleration
+        self.__iterations_used = 0
+        self.__extrapolations = 0
 
     def clone(self):
-        return WeightsCalculatorFactory(self.__config.clone(), self.__iterations, self.__tolerance, self.__correction, self.__scheme)
+        return WeightsCalculatorFactory(self.__config.clone(), self.__iterations, self.__tolerance, self.__correction,
+                                        self.__scheme, self.__acceleration)
+
+    def with_correction(self, correction: float):
+        """Internal method that returns a copy of this calculator which uses another correction, for instance to
+        estimate subsamples of a different size."""
+        return WeightsCalculatorFactory(self.__config, self.__iterations, self.__tolerance, correction, self.__scheme,
+                                        self.__acceleration)
 
     def config(self):
         return self.__config
 
-    def calculate(self, data: pd.DataFrame, path: pd.DataFrame):
-        """Internal method that performs the calculation to estimate weights and scores."""
-        if self.__config.metric():
-            calculator = _MetricWeights(data, self.__config, self.__correction, path)
+    def scheme(self) -> Scheme:
+        return self.__scheme
+
+    def iterations(self) -> int:
+        """Internal method that returns the number of iterations the last calculation took."""
+        return self.__iterations_used
+
+    def extrapolations(self) -> int:
+        """Internal method that returns the number of accelerated steps the last calculation took (see
+        :mod:`.acceleration`)."""
+        return self.__extrapolations
+
+    def calculate(self, data: pd.DataFrame, path: pd.DataFrame, initial_weights: pd.DataFrame = None,
+                  frequencies: np.ndarray = None):
+        """Internal method that performs the calculation to estimate weights and scores.
+
+        Args:
+            data: The treated data.
+            path: The path matrix to estimate.
+            initial_weights: Optionally, outer weights (in the form returned by this method) to start iterating from
+                instead of unit weights, such as the weights from estimating the model on the full dataset.
+            frequencies: Optionally, the number of times each observation occurs, for instance in a bootstrap resample
+                (see :meth:`.Config.treat`). Only supported for metric data.
+
+        Metric data that is much longer than it is wide is estimated from its covariance matrix, so that the cost of
+        each iteration does not grow with the number of observations. If an acceleration was given, it extrapolates the
+        iterations of any of these calculators.
+        """
+        if self.__config.metric() and frequencies is None \
+                and data.shape[0] >= _COVARIANCE_OBSERVATIONS_PER_MV * len(self.__config.blocks(path).mvs()):
+            calculator = _CovarianceWeights(data, self.__config, self.__correction, path, initial_weights)
+        elif self.__config.metric():
+            calculator = _MetricWeights(data, self.__config, self.__correction, path, initial_weights, frequencies)
+        elif frequencies is not None:
+            raise TypeError("Frequencies can only be applied to metric data.")
         else:
-            calculator = _NonmetricWeights(data, self.__config, self.__correction, path)
+            calculator = _NonmetricWeights(data, self.__config, self.__correction, path, initial_weights)
 
-        iteration = 0
-        while True:
-            iteration += 1
-            convergence = calculator.iterate(self.__scheme)
-            if (convergence < self.__tolerance) or (iteration > self.__iterations):
-                break
-        if iteration > self.__iterations:
-            raise Exception("Could not converge after " + str(iteration) + " iterations")
+        # At most self.__iterations iterations are run, as by calculate_batched.
+        if self.__acceleration is None:
+            iteration = 0
+            convergence = np.inf
+            while not convergence < self.__tolerance and iteration < self.__iterations:
+                iteration += 1
+                convergence = calculator.iterate(self.__scheme)
+            self.__extrapolations = 0
+            converged = convergence < self.__tolerance
+        else:
+            iteration, self.__extrapolations, converged = self.__acceleration.value.solve(
+                calculator, self.__scheme, self.__tolerance, self.__iterations)
+        self.__iterations_used = iteration
+        if not converged:
+            raise ConvergenceError("Could not converge after " + str(iteration) + " iterations")
         return calculator.calculate()
+
+    def calculate_batched(self, moments: np.ndarray, path: pd.DataFrame, initial_weights: pd.DataFrame = None) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Internal method that estimates the weights for a batch of resamples of metric data.
+
+        Args:
+            moments: The covariance matrices of the treated resamples, ordered as the outer design matrix.
+            path: The path matrix to estimate.
+            initial_weights: Optionally, outer weights to start iterating from (see :meth:`calculate`).
+
+        Returns:
+            The weights of each resample, with one weight per MV in the order of the outer design matrix, the sign applied
+            to the scores of each latent variable, whether each resample converged, and the number of iterations each
+            resample took. Resamples that did not converge should be discarded.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            calculator = _BatchedMetricWeights(moments, self.__config, self.__correction, path, initial_weights)
+        iterations = np.zeros(moments.shape[0], dtype=int)
+        converged = np.zeros(moments.shape[0], dtype=bool)
+        active = np.flatnonzero(calculator.finite())
+        iteration = 0
+        # Resamples drop out of the batch as soon as they converge (or diverge), so the remaining iterations only
+        # operate on the resamples that still need them. At most self.__iterations iterations are run, as by calculate.
+        with np.errstate(invalid="ignore", divide="ignore"):
+            while active.size > 0 and iteration < self.__iterations:
+                iteration += 1
+                convergence = calculator.iterate(self.__scheme, active)
+                iterations[active] = iteration
+                done = convergence < self.__tolerance
+                converged[active[done]] = True
+                active = active[~done & np.isfinite(convergence)]
+            weights, w_sign = calculator.calculate()
+        return weights, w_sign, converged, iterations
@@ -34,7 +34,8 @@ setuptools.setup(
         "numpy",
         "scipy",
         "statsmodels",
-        "scikit-learn"
+        "scikit-learn",
+        "threadpoolctl"
     ],
     packages=setuptools.find_packages(),
     classifiers=[
@@ -0,0 +1,46 @@
+import pandas as pd, plspm.config as c, pytest
+from plspm.mode import Mode
+
+
+def satisfaction_path_matrix():
+    structure = c.Structure()
+    structure.add_path(["IMAG"], ["EXPE", "SAT", "LOY"])
+    structure.add_path(["EXPE"], ["QUAL", "VAL", "SAT"])
+    structure.add_path(["QUAL"], ["VAL", "SAT"])
+    structure.add_path(["VAL"], ["SAT"])
+    structure.add_path(["SAT"], ["LOY"])
+    return structure.path()
+
+
+@pytest.fixture
+def satisfaction() -> pd.DataFrame:
+    return pd.read_csv("file:tests/data/satisfaction.csv", index_col=0)
+
+
+@pytest.fixture
+def satisfaction_config(satisfaction):
+    """Builds the customer satisfaction model on the satisfaction dataset, with every LV in the given mode except those
+    given their own in ``modes``, and measured by the columns named after it except those given their own in ``mvs``."""
+    def config(mode: Mode = Mode.A, scaled: bool = False, modes: dict = None, mvs: dict = None) -> c.Config:
+        modes, mvs = modes or {}, mvs or {}
+        config = c.Config(satisfaction_path_matrix(), scaled=scaled)
+        for lv in ["IMAG", "EXPE", "QUAL", "VAL", "SAT", "LOY"]:
+            if lv in mvs:
+                config.add_lv(lv, modes.get(lv, mode), *[c.MV(mv) for mv in mvs[lv]])
+            else:
+                config.add_lv_with_columns_named(lv, modes.get(lv, mode), satisfaction, lv.lower())
+        return config
+    return config
+
+
+@pytest.fixture
+def resample_labels():
+    """Labels the statistics a resampler draws for the given model, including the HTMT pairs if ``htmt`` is given."""
+    def labels(data: pd.DataFrame, inner_model, htmt: list = None) -> dict:
+        labels = {"weights": list(data), "r_squared": list(inner_model.r_squared().index),
+                  "total_effects": list(inner_model.effects().index), "paths": list(inner_model.effects().index),
+                  "loadings": list(data)}
+        if htmt is not None:
+            labels["htmt"] = htmt
+        return labels
+    return labels
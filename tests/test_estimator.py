@@ -15,9 +15,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import pytest, pandas.testing as pt, plspm.config as c
+import pytest, pandas as pd, pandas.testing as pt, numpy as np, numpy.testing as npt, plspm.config as c
 from plspm.mode import Mode
+from plspm.scheme import Scheme
+from plspm.scale import Scale
+from plspm.acceleration import Acceleration
+from plspm.plspm import Plspm
 from plspm.estimator import Estimator
+from plspm.weights import WeightsCalculatorFactory
+import plspm.weights as w
 
 def test_can_add_hoc_lv_paths_correctly():
     structure = c.Structure()
@@ -33,4 +39,138 @@ def test_can_add_hoc_lv_paths_correctly():
     structure.add_path(["GOUDA", "CHEDDAR"], ["GOAT"])
     expected = structure.path().drop("APE").drop("APE", axis=1)
     actual = estimator.hoc_path_first_stage(config)
-    pt.assert_frame_equal(expected, actual)
\ No newline at end of file
+    pt.assert_frame_equal(expected, actual)
+
+@pytest.mark.parametrize("mode,scheme,scaled", [(Mode.A, Scheme.CENTROID, False), (Mode.B, Scheme.PATH, True),
+                                                (Mode.A, Scheme.FACTORIAL, True)])
+def test_estimating_with_frequencies_matches_estimating_repeated_rows(mode, scheme, scaled):
+    satisfaction = pd.read_csv("file:tests/data/satisfaction.csv", index_col=0)
+    structure = c.Structure()
+    structure.add_path(["IMAG"], ["EXPE", "SAT"])
+    structure.add_path(["EXPE"], ["SAT"])
+    config = c.Config(structure.path(), scaled=scaled)
+    config.add_lv_with_columns_named("IMAG", mode, satisfaction, "imag")
+    config.add_lv_with_columns_named("EXPE", mode, satisfaction, "expe")
+    config.add_lv_with_columns_named("SAT", mode, satisfaction, "sat")
+    data = config.filter(satisfaction)
+    calculator = WeightsCalculatorFactory(config, 100, 0.000001, np.sqrt(data.shape[0] / (data.shape[0] - 1)), scheme)
+
+    rows = np.random.default_rng(5).integers(data.shape[0], size=data.shape[0])
+    frequencies = np.bincount(rows, minlength=data.shape[0]).astype(np.float64)
+    _, expected_scores, expected_weights = Estimator(config).estimate(calculator, data.iloc[rows, :])
+    _, scores, weights = Estimator(config).estimate(calculator, data, frequencies=frequencies)
+    npt.assert_allclose(expected_weights.values, weights.values, atol=1e-12)
+    npt.assert_allclose(expected_scores.values, scores.iloc[rows, :].values, atol=1e-12)
+
+
+@pytest.mark.parametrize("mode,scheme,scaled", [(Mode.A, Scheme.CENTROID, False), (Mode.B, Scheme.PATH, True),
+                                                (Mode.A, Scheme.FACTORIAL, True)])
+def test_estimating_from_covariance_matches_estimating_from_data(monkeypatch, mode, scheme, scaled):
+    satisfaction = pd.read_csv("file:tests/data/satisfaction.csv", index_col=0)
+    structure = c.Structure()
+    structure.add_path(["IMAG"], ["EXPE", "SAT"])
+    structure.add_path(["EXPE"], ["SAT"])
+    config = c.Config(structure.path(), scaled=scaled)
+    config.add_lv_with_columns_named("IMAG", mode, satisfaction, "imag")
+    config.add_lv_with_columns_named("EXPE", mode, satisfaction, "expe")
+    config.add_lv_with_columns_named("SAT", mode, satisfaction, "sat")
+    data = config.filter(satisfaction)
+    calculator = WeightsCalculatorFactory(config, 100, 0.000001, np.sqrt(data.shape[0] / (data.shape[0] - 1)), scheme)
+
+    monkeypatch.setattr(w, "_COVARIANCE_OBSERVATIONS_PER_MV", data.shape[0] + 1)
+    _, expected_scores, expected_weights = Estimator(config).estimate(calculator, data)
+    monkeypatch.setattr(w, "_COVARIANCE_OBSERVATIONS_PER_MV", 1)
+    _, scores, weights = Estimator(config).estimate(calculator, data)
+    npt.assert_allclose(expected_weights.values, weights.values, atol=1e-12)
+    npt.assert_allclose(expected_scores.values, scores.values, atol=1e-12)
+    pt.assert_index_equal(expected_scores.columns, scores.columns)
+
+
+def slowly_converging_model():
+    # Unrelated MVs make a weakly identified model, which takes over a hundred iterations to converge to 1e-10.
+    data = pd.DataFrame(np.random.default_rng(5).normal(size=(60, 9)), columns=["x" + str(i) for i in range(9)])
+    structure = c.Structure()
+    structure.add_path(["A", "B"], ["C"])
+    config = c.Config(structure.path())
+    for block, lv in enumerate(["A", "B", "C"]):
+        config.add_lv(lv, Mode.A, *[c.MV("x" + str(3 * block + i)) for i in range(3)])
+    return config, config.filter(data)
+
+
+@pytest.mark.parametrize("acceleration", list(Acceleration))
+@pytest.mark.parametrize("covariance", [False, True])
+def test_accelerated_estimation_matches_plain_estimation_in_fewer_iterations(monkeypatch, acceleration, covariance):
+    config, data = slowly_converging_model()
+    monkeypatch.setattr(w, "_COVARIANCE_OBSERVATIONS_PER_MV", 1 if covariance else data.shape[0] + 1)
+    correction = np.sqrt(data.shape[0] / (data.shape[0] - 1))
+    with pytest.raises(w.ConvergenceError):
+        Estimator(config).estimate(WeightsCalculatorFactory(config, 100, 1e-10, correction, Scheme.CENTROID), data)
+    accelerated = Estimator(config)
+    accelerated.estimate(WeightsCalculatorFactory(config, 100, 1e-10, correction, Scheme.CENTROID, acceleration), data)
+    assert accelerated.iterations() < 100
+    assert accelerated.extrapolations() > 0
+
+    # Plain iterations only get close to the solution with a much lower tolerance.
+    _, expected_scores, expected_weights = Estimator(config).estimate(
+        WeightsCalculatorFactory(config, 1000, 1e-20, correction, Scheme.CENTROID), data)
+    _, scores, weights = Estimator(config).estimate(
+        WeightsCalculatorFactory(config, 100, 1e-16, correction, Scheme.CENTROID, acceleration), data)
+    npt.assert_allclose(expected_weights.values, weights.values, atol=1e-6)
+    npt.assert_allclose(expected_scores.values, scores.values, atol=1e-6)
+
+
+@pytest.mark.parametrize("acceleration", list(Acceleration))
+def test_accelerated_estimation_of_nonmetric_data(acceleration):
+    russa = pd.read_csv("file:tests/data/russa.csv", index_col=0)
+    structure = c.Structure()
+    structure.add_path(["AGRI", "IND"], ["POLINS"])
+    config = c.Config(structure.path(), default_scale=Scale.NUM)
+    config.add_lv("AGRI", Mode.A, c.MV("gini"), c.MV("farm"), c.MV("rent"))
+    config.add_lv("IND", Mode.A, c.MV("gnpr", Scale.ORD), c.MV("labo", Scale.ORD))
+    config.add_lv("POLINS", Mode.A, c.MV("ecks"), c.MV("death"), c.MV("demo", Scale.NOM), c.MV("inst"))
+    data = config.filter(russa)
+    correction = np.sqrt(data.shape[0] / (data.shape[0] - 1))
+    plain = Estimator(config)
+    _, expected_scores, expected_weights = plain.estimate(
+        WeightsCalculatorFactory(config, 100, 1e-10, correction, Scheme.CENTROID), data)
+    accelerated = Estimator(config)
+    _, scores, weights = accelerated.estimate(
+        WeightsCalculatorFactory(config, 100, 1e-10, correction, Scheme.CENTROID, acceleration), data)
+    assert accelerated.iterations() < plain.iterations()
+    npt.assert_allclose(expected_weights.values, weights.values, atol=1e-5)
+    npt.assert_allclose(expected_scores.values, scores.values, atol=1e-5)
+
+
+def test_plspm_reports_iterations_of_accelerated_estimation():
+    config, data = slowly_converging_model()
+    plain = Plspm(data, config, Scheme.CENTROID, tolerance=1e-10, iterations=1000)
+    assert plain.iterations()["extrapolations"] == 0
+    accelerated = Plspm(data, config, Scheme.CENTROID, tolerance=1e-10, iterations=1000,
+                        acceleration=Acceleration.ANDERSON)
+    report = accelerated.iterations()
+    assert 0 < report["extrapolations"] < report["iterations"] < plain.iterations()["iterations"]
+    pt.assert_frame_equal(plain.outer_model(), accelerated.outer_model(), atol=1e-4)
+
+
+@pytest.mark.parametrize("scale", [None, Scale.NUM])
+def test_mode_b_block_with_collinear_mvs_shares_weight_between_them(scale):
+    satisfaction = pd.read_csv("file:tests/data/satisfaction.csv", index_col=0)
+    satisfaction["imag1copy"] = satisfaction["imag1"]
+    structure = c.Structure()
+    structure.add_path(["IMAG"], ["EXPE", "SAT"])
+    structure.add_path(["EXPE"], ["SAT"])
+    path = structure.path()
+    weights = {}
+    for imag in [["imag1", "imag2", "imag3"], ["imag1", "imag1copy", "imag2", "imag3"]]:
+        config = c.Config(path.copy(), default_scale=scale, scaled=False)
+        config.add_lv("IMAG", Mode.B, *[c.MV(mv) for mv in imag])
+        config.add_lv("EXPE", Mode.B, *[c.MV("expe" + str(i)) for i in range(1, 4)])
+        config.add_lv("SAT", Mode.A, *[c.MV("sat" + str(i)) for i in range(1, 4)])
+        data = config.filter(satisfaction)
+        calculator = WeightsCalculatorFactory(config, 100, 1e-10, np.sqrt(data.shape[0] / (data.shape[0] - 1)),
+                                              Scheme.PATH)
+        _, _, weights[len(imag)] = Estimator(config).estimate(calculator, data)
+    # The block is singular, so the minimum norm solution splits the weight of imag1 equally between the copies.
+    npt.assert_allclose(weights[4].loc["imag1", "weight"], weights[3].loc["imag1", "weight"] / 2, atol=1e-6)
+    npt.assert_allclose(weights[4].loc["imag1copy", "weight"], weights[3].loc["imag1", "weight"] / 2, atol=1e-6)
+    pt.assert_frame_equal(weights[4].drop(["imag1", "imag1copy"]), weights[3].drop(["imag1"]), atol=1e-6)
@@ -0,0 +1,63 @@
+import pandas as pd, numpy as np, numpy.testing as npt, pytest
+from plspm.plspm import Plspm
+from plspm.mode import Mode
+from plspm.bootstrap import _BatchedResampler
+from concurrent.futures import ProcessPoolExecutor
+from threadpoolctl import threadpool_info, threadpool_limits
+
+
+@pytest.mark.parametrize("scaled", [False, True])
+def test_jackknife_matches_leaving_groups_out(scaled, satisfaction, satisfaction_config):
+    # The downdated moments must give the same estimates as refitting the model without each group, up to the
+    # tolerance of the algorithm, which starts from different weights.
+    config = satisfaction_config(scaled=scaled, modes={"QUAL": Mode.B})
+    jackknife = Plspm(satisfaction, config, jackknife=True, jackknife_group_size=25, seed=7).jackknife()
+    assert jackknife.groups() == 10
+
+    data = config.filter(satisfaction)
+    groups = np.array_split(np.random.default_rng(7).permutation(data.shape[0]), 10)
+    paths, weights = [], []
+    for group in groups:
+        left_in = Plspm(data.drop(index=data.index[group]), config)
+        paths.append(left_in.inner_model().loc[:, "estimate"])
+        weights.append(left_in.outer_model().loc[:, "weight"])
+    paths, weights = pd.concat(paths, axis=1), pd.concat(weights, axis=1)
+
+    summary = jackknife.weights().loc[weights.index, :]
+    npt.assert_allclose(summary.loc[:, "mean"], weights.mean(axis=1), atol=1e-4)
+    npt.assert_allclose(summary.loc[:, "std.error"], np.sqrt(9 / 10 * weights.var(axis=1, ddof=0) * 10), atol=1e-4)
+    npt.assert_allclose(jackknife.paths().loc[:, "mean"].sort_values().values,
+                        paths.mean(axis=1).sort_values().values, atol=1e-4)
+
+
+def test_jackknife_leave_one_out(satisfaction, satisfaction_config):
+    plspm_calc = Plspm(satisfaction, satisfaction_config(modes={"QUAL": Mode.B}), jackknife=True, executor="threads")
+    jackknife = plspm_calc.jackknife()
+    assert jackknife.groups() == satisfaction.shape[0]
+    assert len(jackknife.iterations()) == satisfaction.shape[0]
+    assert jackknife.failures().sum() == 0
+    # Leave-one-out estimates are all close to the full sample's, which the bias reflects.
+    npt.assert_allclose(jackknife.weights().loc[:, "bias"], 0, atol=0.05)
+    assert (jackknife.loading().loc[:, "std.error"] > 0).all()
+
+
+def test_jackknife_workers_limit_blas_threads(monkeypatch, satisfaction, satisfaction_config):
+    config = satisfaction_config(modes={"QUAL": Mode.B})
+    expected = Plspm(satisfaction, config, jackknife=True, jackknife_group_size=25, seed=7,
+                     executor="threads").jackknife()
+    estimate = _BatchedResampler.estimate
+
+    def estimate_reporting_blas_threads(self, moments, start):
+        # Reports the number of BLAS threads the worker runs with in place of the number of iterations.
+        results = estimate(self, moments, start)
+        threads = max(info["num_threads"] for info in threadpool_info() if info["user_api"] == "blas")
+        results["iterations"] = np.full(len(results["iterations"]), threads)
+        return results
+
+    monkeypatch.setattr(_BatchedResampler, "estimate", estimate_reporting_blas_threads)
+    with threadpool_limits(limits=4, user_api="blas"):
+        with ProcessPoolExecutor(2) as executor:
+            limited = Plspm(satisfaction, config, jackknife=True, jackknife_group_size=25, seed=7, executor=executor,
+                            blas_threads=1).jackknife()
+    assert (limited.iterations() == 1).all()
+    pd.testing.assert_frame_equal(expected.paths(), limited.paths())
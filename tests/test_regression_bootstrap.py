@@ -1,7 +1,17 @@
-import pandas.testing as pt, pandas as pd, plspm.util as util, numpy.testing as npt, plspm.config as c, math
+import pandas.testing as pt, pandas as pd, plspm.util as util, numpy.testing as npt, plspm.config as c, math, pytest
+import numpy as np, plspm.inner_model as im, gc, pickle, weakref
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
 from plspm.plspm import Plspm
 from plspm.scheme import Scheme
 from plspm.mode import Mode
+from plspm.scale import Scale
+from plspm.bootstrap import _Job, _Resampler, _BatchedResampler, _Draws, _SharedData, _parallelism, _stability
+from plspm.bootstrap import load_draws
+from plspm.estimator import Estimator
+from plspm.weights import WeightsCalculatorFactory, ConvergenceError
+from plspm.pool import WorkerPool, _Shared
+from plspm.htmt import Htmt
+from threadpoolctl import threadpool_info, threadpool_limits
 
 
 def satisfaction_path_matrix():
@@ -46,3 +56,508 @@ def test_bootstrap_metric():
     expected_boot_loadings = pd.read_csv("file:tests/data/satisfaction_boot_loadings.csv", index_col=0)
     npt.assert_allclose(util.sort_cols(expected_boot_loadings),
                         util.sort_cols(plspm_calc.bootstrap().loading().drop(columns=columns_to_drop)), atol=0.15)
+
+
+def test_bootstrap_metric_shared_memory(satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    plspm_calc = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=20, processes=2, shared_memory=True)
+    npt.assert_allclose(plspm_calc.outer_model().loc[:, "weight"].sort_index(),
+                        plspm_calc.bootstrap().weights().loc[:, "original"].sort_index())
+    npt.assert_allclose(plspm_calc.bootstrap().weights().loc[:, "mean"].sort_index(),
+                        plspm_calc.outer_model().loc[:, "weight"].sort_index(), atol=0.05)
+
+
+def test_workers_resample_shared_data_in_place(satisfaction, satisfaction_config):
+    config = satisfaction_config()
+    shared = _SharedData(config.filter(satisfaction))
+    try:
+        data = shared.attach()
+        values, means = config.metric_values(data)
+        assert np.shares_memory(values, data.values)
+        npt.assert_allclose(means, data.mean())
+    finally:
+        shared.unlink()
+
+
+def test_bootstrap_is_reproducible_whatever_the_number_of_processes(satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    single = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=25, processes=1, seed=42).bootstrap()
+    multiple = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=25, processes=3, seed=42).bootstrap()
+    pt.assert_frame_equal(single.weights(), multiple.weights())
+    pt.assert_frame_equal(single.paths(), multiple.paths())
+    pt.assert_frame_equal(single.loading(), multiple.loading())
+
+
+@pytest.mark.parametrize("mode,scheme,scaled", [(Mode.A, Scheme.CENTROID, False), (Mode.B, Scheme.PATH, True),
+                                                (Mode.A, Scheme.FACTORIAL, True)])
+def test_batched_resampling_matches_per_resample_estimation(mode, scheme, scaled, satisfaction, satisfaction_config,
+                                                            resample_labels):
+    config = satisfaction_config(mode, scaled=scaled)
+
+    data = config.filter(satisfaction)
+    calculator = WeightsCalculatorFactory(config, 100, 0.000001, np.sqrt(data.shape[0] / (data.shape[0] - 1)), scheme)
+    estimator = Estimator(config)
+    _, scores, _ = estimator.estimate(calculator, data)
+    config = estimator.config()
+    inner_model = im.InnerModel(config.path(), scores)
+    labels = resample_labels(data, inner_model, Htmt(config.blocks(config.path())).labels())
+
+    expected = _Resampler(config, data, inner_model, calculator, labels, None).resample(np.random.default_rng(7), 5)
+    actual = _BatchedResampler(config, data, inner_model, calculator, labels, None).resample(np.random.default_rng(7), 5)
+    for statistic in list(labels) + ["iterations"]:
+        npt.assert_allclose(expected[statistic], actual[statistic], atol=1e-10)
+    # Subsamples only use the observations drawn.
+    calculator = calculator.with_correction(np.sqrt(60 / 59))
+    expected = _Resampler(config, data, inner_model, calculator, labels, None,
+                          subsample=60).resample(np.random.default_rng(7), 5)
+    actual = _BatchedResampler(config, data, inner_model, calculator, labels, None,
+                               subsample=60).resample(np.random.default_rng(7), 5)
+    for statistic in list(labels) + ["iterations"]:
+        npt.assert_allclose(expected[statistic], actual[statistic], atol=1e-10)
+
+
+def test_nonmetric_resample_statistics_match_inner_model(resample_labels):
+    russa = pd.read_csv("file:tests/data/russa.csv", index_col=0)
+    russa.iloc[0, 0] = np.NaN
+    structure = c.Structure()
+    structure.add_path(["AGRI", "IND"], ["POLINS"])
+    config = c.Config(structure.path(), default_scale=Scale.NUM)
+    config.add_lv("AGRI", Mode.A, c.MV("gini"), c.MV("farm"), c.MV("rent"))
+    config.add_lv("IND", Mode.B, c.MV("gnpr", Scale.ORD), c.MV("labo", Scale.ORD))
+    config.add_lv("POLINS", Mode.A, c.MV("ecks"), c.MV("death"), c.MV("demo", Scale.NOM), c.MV("inst"))
+
+    data = config.filter(russa)
+    calculator = WeightsCalculatorFactory(config, 100, 0.000001, np.sqrt(data.shape[0] / (data.shape[0] - 1)),
+                                          Scheme.CENTROID)
+    estimator = Estimator(config)
+    _, scores, _ = estimator.estimate(calculator, data)
+    inner_model = im.InnerModel(config.path(), scores)
+    labels = resample_labels(data, inner_model)
+    actual = _Resampler(config, data, inner_model, calculator, labels, None).resample(np.random.default_rng(7), 3)
+
+    random = np.random.default_rng(7)
+    odm = config.odm(config.path())
+    for i in range(3):
+        final_data, scores, _ = estimator.estimate(calculator, data.iloc[random.integers(data.shape[0], size=data.shape[0]), :])
+        expected = im.InnerModel(config.path(), scores)
+        loadings = (scores.apply(lambda s: final_data.corrwith(s)) * odm).sum(axis=1)
+        npt.assert_allclose(actual["r_squared"][i], expected.r_squared().reindex(labels["r_squared"]), atol=1e-10)
+        npt.assert_allclose(actual["paths"][i], expected.effects().loc[:, "direct"].reindex(labels["paths"]), atol=1e-10)
+        npt.assert_allclose(actual["total_effects"][i], expected.effects().loc[:, "total"].reindex(labels["paths"]),
+                            atol=1e-10)
+        npt.assert_allclose(actual["loadings"][i], loadings.reindex(labels["loadings"]), atol=1e-10)
+
+
+def test_workers_encode_nonmetric_data_once(monkeypatch):
+    russa = pd.read_csv("file:tests/data/russa.csv", index_col=0)
+    structure = c.Structure()
+    structure.add_path(["AGRI", "IND"], ["POLINS"])
+    config = c.Config(structure.path(), default_scale=Scale.NUM)
+    config.add_lv("AGRI", Mode.A, c.MV("gini"), c.MV("farm"), c.MV("rent"))
+    config.add_lv("IND", Mode.A, c.MV("gnpr", Scale.ORD), c.MV("labo", Scale.ORD))
+    config.add_lv("POLINS", Mode.A, c.MV("ecks"), c.MV("death"), c.MV("demo", Scale.NOM), c.MV("inst"))
+    encoded = []
+    categorical_codes = c.Config.categorical_codes
+    monkeypatch.setattr(c.Config, "categorical_codes", lambda self, data: encoded.append(data.shape) or
+                        categorical_codes(self, data))
+    built = []
+    build = _Job.resampler
+
+    def resampler(self, data):
+        resampler = build(self, data)
+        built.append(weakref.ref(resampler))
+        return resampler
+
+    monkeypatch.setattr(_Job, "resampler", resampler)
+    with ThreadPoolExecutor(1) as executor:
+        bootstrap = Plspm(russa, config, bootstrap=True, bootstrap_iterations=30, seed=2,
+                          executor=executor).bootstrap()
+        assert bootstrap.workers().loc[:, "chunks"].sum() == 3
+        assert len(encoded) == 1
+        # The worker outlives the bootstrap, but does not keep its resampler, or the data it holds, alive.
+        gc.collect()
+        assert len(built) == 1 and built[0]() is None
+
+
+def test_warm_start_reduces_iterations(satisfaction, satisfaction_config):
+    config = satisfaction_config(Mode.B)
+
+    cold = Plspm(satisfaction, config, bootstrap=True, processes=1, seed=3, warm_start=False).bootstrap()
+    warm = Plspm(satisfaction, config, bootstrap=True, processes=1, seed=3).bootstrap()
+    assert warm.iterations().sum() < cold.iterations().sum()
+    npt.assert_allclose(cold.paths().loc[:, "mean"], warm.paths().loc[:, "mean"], atol=0.001)
+
+
+def test_streaming_summaries_match_summaries_of_kept_draws(satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    kept = Plspm(satisfaction, config, bootstrap=True, processes=2, seed=5).bootstrap()
+    streamed = Plspm(satisfaction, config, bootstrap=True, processes=2, seed=5, streaming=True).bootstrap()
+    pt.assert_frame_equal(kept.weights(), streamed.weights())
+    pt.assert_frame_equal(kept.r_squared(), streamed.r_squared())
+    pt.assert_frame_equal(kept.paths(), streamed.paths())
+    pt.assert_frame_equal(kept.total_effects(), streamed.total_effects())
+    pt.assert_frame_equal(kept.loading(), streamed.loading())
+
+
+def test_adaptive_bootstrap_stops_once_estimates_settle(satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    adaptive = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=5000, processes=2, seed=11,
+                     bootstrap_tolerance=0.02, bootstrap_round_size=100).bootstrap()
+    assert 200 <= adaptive.resamples() < 5000
+    assert adaptive.resamples() % 100 == 0
+    fixed = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=adaptive.resamples(), processes=2,
+                  seed=11).bootstrap()
+    assert fixed.resamples() == adaptive.resamples()
+    pt.assert_frame_equal(fixed.paths(), adaptive.paths())
+
+
+def test_bootstrap_accounts_for_resamples_time_and_workers(satisfaction, satisfaction_config, resample_labels):
+    config = satisfaction_config()
+
+    boot = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=40, processes=2, seed=1).bootstrap()
+    counts = boot.counts()
+    assert counts["requested"] == counts["drawn"] == 40
+    assert counts["succeeded"] + counts["failed"] == 40
+    assert boot.failures().sum() == counts["failed"]
+    assert boot.timing().loc["iterations", "count"] == counts["succeeded"]
+    assert boot.timing().loc["seconds", "min"] >= 0
+    assert boot.workers().loc[:, "resamples"].sum() == 40
+    assert (boot.workers().loc[:, "resamples_per_second"] > 0).all()
+
+    data = config.filter(satisfaction)
+    calculator = WeightsCalculatorFactory(config, 100, 0.000001, np.sqrt(data.shape[0] / (data.shape[0] - 1)),
+                                          Scheme.CENTROID)
+    _, scores, _ = Estimator(config).estimate(calculator, data)
+    inner_model = im.InnerModel(config.path(), scores)
+    labels = resample_labels(data, inner_model)
+    impatient = WeightsCalculatorFactory(config, 1, 0.000001, np.sqrt(data.shape[0] / (data.shape[0] - 1)),
+                                         Scheme.CENTROID)
+    for resampler in [_Resampler, _BatchedResampler]:
+        results = resampler(config, data, inner_model, impatient, labels, None).resample(np.random.default_rng(7), 5)
+        assert results["failures"] == {"ConvergenceError": 5}
+        assert results["weights"].shape[0] == 0
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_bootstrap_resumes_from_checkpoint(tmp_path, streaming, satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    checkpoint = str(tmp_path / "bootstrap.npz")
+    uninterrupted = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=60, processes=2, seed=9,
+                          streaming=streaming).bootstrap()
+    # A shorter bootstrap stands in for one that was interrupted after its first chunks had been saved.
+    Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=30, processes=2, seed=9, streaming=streaming,
+          bootstrap_checkpoint=checkpoint)
+    resumed = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=60, processes=2, seed=9,
+                    streaming=streaming, bootstrap_checkpoint=checkpoint).bootstrap()
+    assert resumed.counts()["drawn"] == 60
+    assert resumed.workers().loc[:, "resamples"].sum() == 60
+    pt.assert_frame_equal(uninterrupted.weights(), resumed.weights())
+    pt.assert_frame_equal(uninterrupted.paths(), resumed.paths())
+    pt.assert_frame_equal(uninterrupted.loading(), resumed.loading())
+    pt.assert_series_equal(uninterrupted.iterations(), resumed.iterations())
+
+    with pytest.raises(Exception):
+        Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=60, processes=2, seed=10,
+              streaming=streaming, bootstrap_checkpoint=checkpoint)
+
+
+def test_bootstrap_checkpoint_and_draws_are_not_resumed_for_another_model(tmp_path, satisfaction, satisfaction_config):
+    # Both models have the same number of parameters.
+    first, second = satisfaction_config(), satisfaction_config(Mode.B)
+    checkpoint, directory = str(tmp_path / "first.npz"), str(tmp_path / "first")
+    Plspm(satisfaction, first, Scheme.CENTROID, bootstrap=True, bootstrap_iterations=30, processes=2, seed=9,
+          bootstrap_checkpoint=checkpoint, bootstrap_draws=directory)
+    Plspm(satisfaction, second, Scheme.PATH, bootstrap=True, bootstrap_iterations=30, processes=2, seed=9,
+          bootstrap_checkpoint=str(tmp_path / "second.npz"), bootstrap_draws=str(tmp_path / "second"))
+    with pytest.raises(Exception, match="different seed, model"):
+        Plspm(satisfaction, second, Scheme.PATH, bootstrap=True, bootstrap_iterations=60, processes=2, seed=9,
+              bootstrap_checkpoint=checkpoint)
+    with pytest.raises(Exception, match="different model"):
+        Plspm(satisfaction, second, Scheme.PATH, bootstrap=True, bootstrap_iterations=60, processes=2, seed=9,
+              bootstrap_checkpoint=str(tmp_path / "second.npz"), bootstrap_draws=directory)
+    resumed = Plspm(satisfaction, first, Scheme.CENTROID, bootstrap=True, bootstrap_iterations=60, processes=2,
+                    seed=9, bootstrap_checkpoint=checkpoint, bootstrap_draws=directory).bootstrap()
+    assert resumed.workers().index.str.startswith("resumed").any()
+
+def test_bootstrap_keeps_raw_draws(tmp_path, satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    in_memory = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=60, processes=2, seed=9,
+                      bootstrap_draws=True).bootstrap()
+    weights = in_memory.draws("weights")
+    assert weights.shape == (60, config.filter(satisfaction).shape[1])
+    assert (weights.dtypes == np.float32).all()
+    npt.assert_allclose(weights.mean(axis=0), in_memory.weights().loc[:, "mean"], atol=1e-6)
+    assert in_memory.draws("paths").mean(axis=0).reindex(in_memory.paths().index).notnull().all()
+    with pytest.raises(Exception):
+        Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=10, processes=2).bootstrap().draws("weights")
+
+    # Draws kept in a directory are filled in by a bootstrap resumed from a checkpoint, and can be reopened later.
+    directory, checkpoint = str(tmp_path / "draws"), str(tmp_path / "bootstrap.npz")
+    Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=30, processes=2, seed=9, streaming=True,
+          bootstrap_checkpoint=checkpoint, bootstrap_draws=directory)
+    resumed = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=60, processes=2, seed=9, streaming=True,
+                    bootstrap_checkpoint=checkpoint, bootstrap_draws=directory).bootstrap()
+    reopened = load_draws(directory)
+    for statistic in ["weights", "r_squared", "total_effects", "paths", "loadings"]:
+        pt.assert_frame_equal(in_memory.draws(statistic), resumed.draws(statistic))
+        pt.assert_frame_equal(in_memory.draws(statistic), reopened[statistic])
+    # Reopened read-only from the memory-mapped files rather than read into memory.
+    assert not reopened["weights"].values.flags.writeable
+
+
+def test_bootstrap_htmt_intervals(satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    plspm_calc = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=100, seed=3, bootstrap_htmt=True,
+                       bootstrap_draws=True)
+    htmt = plspm_calc.bootstrap().htmt()
+    ratios = plspm_calc.htmt()
+    assert list(htmt.index) == [row + " - " + column for i, row in enumerate(ratios.index)
+                                for column in ratios.columns[:i]]
+    npt.assert_allclose(htmt.loc["QUAL - IMAG", "original"], ratios.loc["QUAL", "IMAG"])
+    assert (htmt.loc[:, "std.error"] > 0).all()
+    assert ((htmt.loc[:, "perc.025"] < htmt.loc[:, "original"])
+            & (htmt.loc[:, "original"] < htmt.loc[:, "perc.975"])).all()
+    npt.assert_allclose(plspm_calc.bootstrap().draws("htmt").mean(axis=0), htmt.loc[:, "mean"], atol=1e-6)
+    # The ratios are only bootstrapped on request.
+    with pytest.raises(Exception):
+        Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=10, seed=3).bootstrap().htmt()
+
+
+def test_adaptive_bootstrap_replays_stopping_from_checkpoint(tmp_path, satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    checkpoint = str(tmp_path / "bootstrap.npz")
+    first = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=5000, processes=2, seed=11,
+                  bootstrap_tolerance=0.02, bootstrap_checkpoint=checkpoint, streaming=True).bootstrap()
+    again = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=5000, processes=2, seed=11,
+                  bootstrap_tolerance=0.02, bootstrap_checkpoint=checkpoint, streaming=True).bootstrap()
+    assert again.resamples() == first.resamples() < 5000
+    pt.assert_frame_equal(first.paths(), again.paths())
+
+
+def test_bayesian_bootstrap(satisfaction, satisfaction_config, resample_labels):
+    config = satisfaction_config()
+
+    data = config.filter(satisfaction)
+    calculator = WeightsCalculatorFactory(config, 100, 0.000001, np.sqrt(data.shape[0] / (data.shape[0] - 1)),
+                                          Scheme.CENTROID)
+    _, scores, _ = Estimator(config).estimate(calculator, data)
+    inner_model = im.InnerModel(config.path(), scores)
+    labels = resample_labels(data, inner_model)
+    expected = _Resampler(config, data, inner_model, calculator, labels, None, True).resample(np.random.default_rng(7), 5)
+    actual = _BatchedResampler(config, data, inner_model, calculator, labels, None, True).resample(
+        np.random.default_rng(7), 5)
+    for statistic in list(labels) + ["iterations"]:
+        npt.assert_allclose(expected[statistic], actual[statistic], atol=1e-10)
+
+    plspm_calc = Plspm(satisfaction, config, bootstrap=True, processes=2, seed=2, bayesian_bootstrap=True)
+    npt.assert_allclose(plspm_calc.bootstrap().paths().loc[:, "mean"], plspm_calc.bootstrap().paths().loc[:, "original"],
+                        atol=0.05)
+
+
+def test_batched_and_per_resample_estimation_share_the_iteration_cap(satisfaction, satisfaction_config,
+                                                                     resample_labels):
+    config = satisfaction_config()
+
+    data = config.filter(satisfaction)
+    correction = np.sqrt(data.shape[0] / (data.shape[0] - 1))
+    calculator = WeightsCalculatorFactory(config, 100, 0.000001, correction, Scheme.CENTROID)
+    estimator = Estimator(config)
+    _, scores, _ = estimator.estimate(calculator, data)
+    needed = estimator.iterations()
+    config = estimator.config()
+    inner_model = im.InnerModel(config.path(), scores)
+    labels = resample_labels(data, inner_model)
+    # The full dataset, drawn once, as a batch of one resample.
+    moments = config.drawn_moments(*config.metric_values(data), [(np.arange(data.shape[0]), np.ones(data.shape[0]))])
+
+    capped = WeightsCalculatorFactory(config, needed, 0.000001, correction, Scheme.CENTROID)
+    estimator = Estimator(config)
+    estimator.estimate(capped, data)
+    assert estimator.iterations() == needed
+    batched = _BatchedResampler(config, data, inner_model, capped, labels, None).estimate(moments, 0)
+    assert list(batched["iterations"]) == [needed]
+    capped = WeightsCalculatorFactory(config, needed - 1, 0.000001, correction, Scheme.CENTROID)
+    with pytest.raises(ConvergenceError):
+        Estimator(config).estimate(capped, data)
+    batched = _BatchedResampler(config, data, inner_model, capped, labels, None).estimate(moments, 0)
+    assert batched["failures"]["ConvergenceError"] == 1
+
+
+def test_bootstrap_without_batching_matches_batched_bootstrap(satisfaction, satisfaction_config, monkeypatch):
+    config = satisfaction_config()
+
+    batched = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=30, seed=4,
+                    executor="threads").bootstrap()
+    monkeypatch.setattr("plspm.bootstrap._BATCHED", False)
+    unbatched = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=30, seed=4,
+                      executor="threads").bootstrap()
+    for statistic in ["weights", "paths", "loading", "r_squared", "total_effects"]:
+        pt.assert_frame_equal(getattr(batched, statistic)(), getattr(unbatched, statistic)(), check_exact=False,
+                              atol=1e-10)
+    pt.assert_series_equal(batched.iterations(), unbatched.iterations())
+
+
+def test_bootstrap_gives_the_same_results_whatever_the_executor(satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    expected = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=30, processes=2, seed=4).bootstrap()
+    threads = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=30, processes=3, seed=4,
+                    executor="threads").bootstrap()
+    assert threads.workers().index.str.startswith("BootstrapThread").all()
+    with ThreadPoolExecutor(2) as thread_pool, ProcessPoolExecutor(2) as process_pool:
+        results = [threads]
+        for executor in [thread_pool, process_pool]:
+            results.append(Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=30, seed=4,
+                                 executor=executor).bootstrap())
+        # The executors passed in are left running.
+        assert thread_pool.submit(sum, [1, 2]).result() == 3
+        assert process_pool.submit(sum, [1, 2]).result() == 3
+    for actual in results:
+        pt.assert_frame_equal(expected.weights(), actual.weights())
+        pt.assert_frame_equal(expected.paths(), actual.paths())
+        pt.assert_frame_equal(expected.loading(), actual.loading())
+
+
+def test_worker_pool_is_reused_across_models(satisfaction, satisfaction_config):
+    configs = [satisfaction_config(mode) for mode in [Mode.A, Mode.B]]
+
+    with WorkerPool(2) as pool:
+        workers = set()
+        for config in configs:
+            expected = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=30, seed=8).bootstrap()
+            pooled = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=30, seed=8,
+                           executor=pool).bootstrap()
+            pt.assert_frame_equal(expected.weights(), pooled.weights())
+            pt.assert_frame_equal(expected.paths(), pooled.paths())
+            workers.update(pooled.workers().index)
+        assert len(workers) <= pool.processes()
+    with pytest.raises(RuntimeError):
+        pool.submit(sum, [1, 2])
+
+
+def _load(shared: _Shared):
+    # Run by a worker of the pool.
+    return shared.get()
+
+
+def test_worker_pool_publishes_each_dataset_once(monkeypatch, satisfaction):
+    pickled = []
+    dumps = pickle.dumps
+    monkeypatch.setattr(pickle, "dumps", lambda value, *args, **kwargs: pickled.append(type(value)) or
+                        dumps(value, *args, **kwargs))
+    with WorkerPool(1) as pool:
+        first = pool.share(satisfaction, retain=True)
+        # The same content is found again without pickling it, but a change to it is not.
+        again = pool.share(satisfaction.copy(), retain=True)
+        changed = pool.share(satisfaction.iloc[::-1, :], retain=True)
+        assert first.key() == again.key() != changed.key()
+        assert pickled.count(pd.DataFrame) == 2
+        assert pool.submit(_load, again).result().equals(satisfaction)
+        for shared in [first, again, changed]:
+            pool.release(shared)
+
+
+def test_auto_parallelism_splits_cores_between_workers_and_blas_threads(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 64)
+    assert _parallelism(None, "auto", 250, 27) == (64, 1)
+    assert _parallelism(None, "auto", 100000, 80) == (10, 6)
+    assert _parallelism(None, "auto", 100000, 500) == (1, 64)
+    assert _parallelism(16, "auto", 250, 27) == (16, 4)
+    assert _parallelism(None, 1, 250, 27) == (64, 1)
+    assert _parallelism(3, None, 250, 27) == (3, None)
+
+
+def test_default_parallelism_does_not_oversubscribe_cores(monkeypatch, satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    parallelism = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=20, seed=6,
+                        executor="threads").bootstrap().parallelism()
+    assert parallelism["workers"] == 8
+    assert parallelism["workers"] * parallelism["blas_threads"] <= 8
+
+
+def test_parallelism_follows_the_executor_passed_in(monkeypatch, satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    class Inline(Executor):
+        # An executor that cannot tell how many workers it has.
+        def submit(self, fn, *args, **kwargs):
+            future = Future()
+            future.set_result(fn(*args, **kwargs))
+            return future
+
+    monkeypatch.setattr("os.cpu_count", lambda: 64)
+    with ThreadPoolExecutor(2) as executor:
+        parallelism = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=20, seed=6,
+                            executor=executor).bootstrap().parallelism()
+    assert (parallelism["workers"], parallelism["blas_threads"]) == (2, 32)
+    parallelism = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=20, seed=6,
+                        executor=Inline()).bootstrap().parallelism()
+    assert parallelism["workers"] is None and parallelism["blas_threads"] is None
+
+
+def test_bootstrap_limits_blas_threads(monkeypatch, satisfaction, satisfaction_config):
+    config = satisfaction_config()
+
+    expected = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=20, processes=2, seed=6,
+                     blas_threads=None).bootstrap()
+    # Workers report the number of BLAS threads they run with in place of their name. Without a limit, they would
+    # inherit the four threads this process runs with.
+    monkeypatch.setattr("plspm.bootstrap._worker_name", lambda: str(max(info["num_threads"] for info in threadpool_info()
+                                                                        if info["user_api"] == "blas")))
+    monkeypatch.setattr("os.cpu_count", lambda: 2)
+    with threadpool_limits(limits=4, user_api="blas"):
+        with ProcessPoolExecutor(2) as pool:
+            for executor in ["processes", "threads", pool]:
+                for blas_threads in [1, "auto"]:
+                    limited = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=20, processes=2, seed=6,
+                                    executor=executor, blas_threads=blas_threads).bootstrap()
+                    assert limited.parallelism()["workers"] == 2
+                    assert limited.parallelism()["blas_threads"] == 1
+                    assert list(limited.workers().index) == ["1"]
+                    pt.assert_frame_equal(expected.paths(), limited.paths())
+
+
+def test_subsample_bootstrap_rescales_dispersion_to_the_full_dataset(satisfaction, satisfaction_config,
+                                                                     resample_labels):
+    config = satisfaction_config()
+
+    full = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=1000, seed=1).bootstrap()
+    subsample = Plspm(satisfaction, config, bootstrap=True, bootstrap_iterations=1000, seed=1,
+                      bootstrap_subsample=125).bootstrap()
+    npt.assert_allclose(full.paths().loc[:, "std.error"], subsample.paths().loc[:, "std.error"], rtol=0.1)
+    npt.assert_allclose(full.weights().loc[:, "std.error"], subsample.weights().loc[:, "std.error"], rtol=0.1)
+    npt.assert_allclose(full.paths().loc[:, "perc.975"], subsample.paths().loc[:, "perc.975"], atol=0.03)
+
+    data = config.filter(satisfaction)
+    calculator = WeightsCalculatorFactory(config, 100, 0.000001, np.sqrt(125 / 124), Scheme.CENTROID)
+    _, scores, _ = Estimator(config).estimate(calculator, data)
+    inner_model = im.InnerModel(config.path(), scores)
+    labels = resample_labels(data, inner_model)
+    expected = _Resampler(config, data, inner_model, calculator, labels, None, subsample=125).resample(
+        np.random.default_rng(7), 5)
+    actual = _BatchedResampler(config, data, inner_model, calculator, labels, None, subsample=125).resample(
+        np.random.default_rng(7), 5)
+    for statistic in list(labels) + ["iterations"]:
+        npt.assert_allclose(expected[statistic], actual[statistic], atol=1e-10)
+
+
+def test_subsample_stability_includes_percentiles():
+    labels = {"paths": ["IMAG -> EXPE"], "weights": ["imag1", "imag2"], "loadings": ["imag1", "imag2"]}
+    originals = {statistic: pd.Series(0.5, index=index) for statistic, index in labels.items()}
+    draws = _Draws(labels, scale=0.5)
+    random = np.random.default_rng(3)
+    draws.add({statistic: random.normal(0.5, 0.1, (50, len(index))) for statistic, index in labels.items()})
+    # Adaptive subsample bootstraps stop on the percentile bounds as reported, as well as on the standard errors.
+    stability = _stability(draws, originals)
+    assert np.isfinite(stability).all()
+    npt.assert_allclose(stability[:3], draws.summary("paths", originals["paths"]).iloc[0, 2:5])
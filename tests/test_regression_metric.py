@@ -123,4 +123,18 @@ def test_only_single_item_constructs():
     plspm_calc = Plspm(satisfaction, config, Scheme.CENTROID)
     with pytest.raises(ValueError):
         plspm_calc.goodness_of_fit()
-        
\ No newline at end of file
+        
+def test_htmt(satisfaction, satisfaction_config):
+    config = satisfaction_config(mvs={"SAT": ["sat1"]})
+    htmt = Plspm(satisfaction, config, Scheme.CENTROID).htmt()
+
+    cor = satisfaction.corr().abs()
+    def monotrait(lv):
+        mvs = config.mvs(lv)
+        return (cor.loc[mvs, mvs].values.sum() - len(mvs)) / (len(mvs) * (len(mvs) - 1))
+    expected = cor.loc[config.mvs("QUAL"), config.mvs("IMAG")].values.mean() \
+        / math.sqrt(monotrait("QUAL") * monotrait("IMAG"))
+    assert htmt.loc["QUAL", "IMAG"] == pytest.approx(expected)
+    assert math.isnan(htmt.loc["IMAG", "QUAL"])
+    assert math.isnan(htmt.loc["SAT", "IMAG"])
+    assert htmt.loc["LOY", "VAL"] > 0
@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+#
+# Copyright (C) 2019 Google Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np, numpy.testing as npt
+from plspm.streaming import Moments, QuantileSketch
+
+
+def test_merged_moments_match_moments_of_all_draws():
+    draws = np.random.default_rng(1).normal(5, 2, size=(1000, 3))
+    draws[10, 1] = np.nan
+    first = Moments(3)
+    first.update(draws[:300])
+    second = Moments(3)
+    second.update(draws[300:700])
+    second.update(draws[700:])
+    first.merge(second)
+    npt.assert_allclose(np.nanmean(draws, axis=0), first.mean())
+    npt.assert_allclose(np.nanstd(draws, axis=0, ddof=1), first.std())
+    npt.assert_array_equal([1000, 999, 1000], first.count())
+
+
+def test_quantile_sketch_is_exact_until_full_and_close_afterwards():
+    draws = np.random.default_rng(2).normal(size=(20000, 2))
+    sketch = QuantileSketch(2, capacity=256)
+    sketch.update(draws[:200])
+    npt.assert_allclose(np.quantile(draws[:200], 0.025, axis=0), sketch.quantile(0.025))
+    other = QuantileSketch(2, capacity=256)
+    for chunk in np.array_split(draws[200:], 100):
+        other.update(chunk)
+    sketch.merge(other)
+    npt.assert_allclose(np.quantile(draws, [0.025, 0.975], axis=0), [sketch.quantile(0.025), sketch.quantile(0.975)],
+                        atol=0.05)
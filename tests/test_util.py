@@ -33,3 +33,30 @@ def test_ranking():
     data = pd.Series([0.75, -1.5, 3, -1.5, 15])
     expected_rank = pd.Series([2, 1, 3, 1, 4])
     assert util.rank(data).astype(int).equals(expected_rank)
+
+def test_ranking_from_codes():
+    # Codes are positions among the distinct values of the full data; a subset need not contain all of them.
+    data = pd.Series([0.75, -1.5, 3, np.NaN, 15, 3])
+    codes = np.array([1, 0, 2, -1, 3, 2])
+    for rows in [np.arange(6), np.array([0, 2, 2, 3, 5])]:
+        subset = data.iloc[rows].reset_index(drop=True)
+        ranks, dummies = util.rank_codes(codes[rows], 4)
+        npt.assert_array_equal(util.rank(subset).values, ranks)
+        npt.assert_array_equal(util.dummy(util.rank(subset)).values, dummies)
+
+def test_blocks_match_outer_design_matrix():
+    mvs = {"a": ["a1", "a2"], "b": ["b1"], "c": ["c1", "c2", "c3"]}
+    odm = util.list_to_dummy(mvs).values
+    blocks = util.Blocks(mvs)
+    assert blocks.mvs() == ["a1", "a2", "b1", "c1", "c2", "c3"]
+    npt.assert_array_equal(blocks.lv_index(), [0, 0, 1, 2, 2, 2])
+    random = np.random.default_rng(3)
+    data = random.normal(size=(10, 6))
+    moments = random.normal(size=(4, 6, 6))
+    weights = random.normal(size=(4, 6))
+    npt.assert_allclose(blocks.dot(data, weights[0]), data.dot(odm * weights[0, :, np.newaxis]))
+    npt.assert_allclose(blocks.sum(weights), weights.dot(odm))
+    cross, covariance = blocks.covariance(moments, weights)
+    dense = odm[np.newaxis, :, :] * weights[:, :, np.newaxis]
+    npt.assert_allclose(cross, np.matmul(moments, dense))
+    npt.assert_allclose(covariance, np.matmul(np.matmul(dense.transpose(0, 2, 1), moments), dense))